@@ -3,7 +3,14 @@ Texas Tourism AI Agent System Prompt
 Comprehensive sales-focused prompt for TravelTexas.com promotion
 """
 
-TEXAS_TOURISM_AGENT_PROMPT = """You are a Senior Texas Tourism Sales Specialist representing TravelTexas.com, the official tourism website of Texas. You are an expert in Texas travel, culture, and commerce with deep knowledge of all regions, attractions, and booking opportunities.
+import functools
+import os
+from types import MappingProxyType
+
+# Immutable static prefix of the system prompt. Keep this byte-identical
+# across requests — provider prompt caches match on exact prefixes, so any
+# variable or per-user content must go through build_system_prompt() below.
+_STATIC_PREFIX = """You are a Senior Texas Tourism Sales Specialist representing TravelTexas.com, the official tourism website of Texas. You are an expert in Texas travel, culture, and commerce with deep knowledge of all regions, attractions, and booking opportunities.
 
 === CORE IDENTITY & MISSION ===
 🎯 ROLE: Official Texas Tourism Sales Agent for TravelTexas.com
@@ -200,8 +207,66 @@ FOR OUTDOOR ADVENTURE:
 
 REMEMBER: Every response should drive toward a booking or website visit. You're not just providing information - you're selling Texas experiences and converting visitors into travelers!"""
 
-# Welcome message for the chat interface
-WELCOME_MESSAGE = {
+TEXAS_TOURISM_AGENT_PROMPT = _STATIC_PREFIX
+
+
+def get_agent_prompt(mode: str = None) -> str:
+    """Single entry point for the system prompt.
+
+    Defaults to the condensed variant (~400 tokens vs ~2300 for the full
+    prompt, see TOKEN_COMPARISON in agent_prompt_condensed) so every call
+    pays ~5x less prefill cost. The verbose prompt is an explicit opt-in
+    via mode="full" or the AGENT_PROMPT_MODE environment variable.
+    """
+    if mode is None:
+        mode = os.getenv("AGENT_PROMPT_MODE", "condensed")
+    if mode == "full":
+        return TEXAS_TOURISM_AGENT_PROMPT
+    from agent_prompt_condensed import TEXAS_TOURISM_AGENT_PROMPT_CONDENSED
+    return TEXAS_TOURISM_AGENT_PROMPT_CONDENSED
+
+
+def build_system_prompt(user_ctx: str = "") -> str:
+    """Build the system prompt with optional per-user/session context.
+
+    The static prefix stays frozen so provider prompt caches keep hitting;
+    any variable content is appended after a fixed delimiter at the end.
+    """
+    if not user_ctx:
+        return _STATIC_PREFIX
+    return _STATIC_PREFIX + "\n=== USER CONTEXT ===\n" + user_ctx
+
+
+# Stable version string for provider-side prompt cache routing.
+# Pass this as prompt_cache_key on OpenAI-style calls so requests sharing
+# the static system prompt land on the same cache. Bump when the prompt changes.
+PROMPT_CACHE_KEY = "texas-tourism-v1"
+
+# Anthropic-style system block with cache_control so turns after the first
+# pay the discounted cached-input rate for the static prompt
+CACHED_SYSTEM_BLOCK = [
+    {
+        "type": "text",
+        "text": TEXAS_TOURISM_AGENT_PROMPT,
+        "cache_control": {"type": "ephemeral"}
+    }
+]
+
+
+@functools.cache
+def get_tokenized_prompt(model: str = "gpt-3.5-turbo"):
+    """Return the system prompt pre-encoded into token IDs for the given model.
+
+    Tokenizing the ~2300-token prompt is done once per model and memoized,
+    so callers that need token counts or IDs don't re-run BPE per request.
+    """
+    import tiktoken
+    return tiktoken.encoding_for_model(model).encode(TEXAS_TOURISM_AGENT_PROMPT)
+
+
+# Welcome message for the chat interface; frozen so every session shares
+# one immutable dict instead of callers mutating (or re-allocating) it
+WELCOME_MESSAGE = MappingProxyType({
     "role": "assistant",
     "content": "🤠 **WELCOME TO TEXAS - Y'ALL'S ADVENTURE STARTS HERE!**\n\nI'm your official Texas Tourism expert from [TravelTexas.com](https://www.traveltexas.com), here to help y'all plan the perfect Lone Star State getaway!\n\n🔥 **FALL SPECIALS - BOOK NOW!**\n• **Hill Country Wine Trail** - 3-day package $299 (Save $100!)\n• **Austin BBQ Experience** - Skip-the-line tours $199\n• **Big Bend Stargazing** - Guided night tours $149\n• **Gulf Coast Beach Getaway** - 2-night packages $249\n\n🎯 **POPULAR EXPERIENCES:**\n• 🏞️ **Outdoor Adventure** - State parks, hiking, fishing\n• 🍖 **Food & Drink** - BBQ tours, wineries, craft breweries\n• 🎵 **Music & Film** - Live venues, film locations\n• 🏇 **Western Experience** - Rodeos, ranches, cowboy culture\n• 🎨 **Arts & Culture** - Museums, historic sites, festivals\n\n⭐ *\"Texas exceeded every expectation! The BBQ, the music, the people - absolutely incredible!\"* - Sarah M., California\n\n**What Texas adventure calls to y'all?** Let me customize the perfect itinerary for you! 🌟"
-}
+})
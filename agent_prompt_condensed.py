@@ -3,7 +3,9 @@ Condensed Texas Tourism AI Agent System Prompt
 Optimized for 80% token reduction while maintaining sales effectiveness
 """
 
-TEXAS_TOURISM_AGENT_PROMPT_CONDENSED = """You are a Texas Tourism Sales Specialist for TravelTexas.com. Convert interactions into bookings.
+# Immutable static prefix — keep byte-identical across requests so provider
+# prompt caches match; variable content goes through build_system_prompt()
+_STATIC_PREFIX = """You are a Texas Tourism Sales Specialist for TravelTexas.com. Convert interactions into bookings.
 
 GREETING: Only greet with "Howdy!" on the very first message. For all subsequent messages, respond directly to the user's question without any greeting or salutation. Never repeat "Howdy" or any greeting after the first interaction.
 
@@ -36,6 +38,16 @@ RESPONSE STYLE:
 
 Remember: Every response should drive traffic to TravelTexas.com or local businesses."""
 
+TEXAS_TOURISM_AGENT_PROMPT_CONDENSED = _STATIC_PREFIX
+
+
+def build_system_prompt(user_ctx: str = "") -> str:
+    """Build the condensed system prompt with optional per-user/session context"""
+    if not user_ctx:
+        return _STATIC_PREFIX
+    return _STATIC_PREFIX + "\n=== USER CONTEXT ===\n" + user_ctx
+
+
 # Token count comparison
 TOKEN_COMPARISON = {
     "original": 2317,
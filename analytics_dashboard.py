@@ -3,25 +3,160 @@ Analytics Dashboard for Travel Texas AI Agent
 Provides cost analytics, usage trends, and reporting capabilities
 """
 
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional
+from __future__ import annotations
+
+import functools
+import hashlib
 import json
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List
+from itertools import cycle, islice
 from cost_engine import CostCalculationEngine
 from budget_manager import BudgetManager
 
+# pandas/plotly are imported on first use — together they cost several
+# hundred ms and tens of MB of RSS, which request paths that never open
+# the dashboard shouldn't pay
+pd = None
+go = None
+
+
+def _lazy_imports():
+    """Bind pandas and plotly.graph_objects on first dashboard use"""
+    global pd, go
+    if pd is None:
+        import pandas
+        import plotly.graph_objects
+        pd = pandas
+        go = plotly.graph_objects
+
+
+# Shared chart palette; cycled so charts with more series than colors
+# wrap around instead of falling back to Plotly defaults
+COLORS = ('#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7')
+
+# Typed session record: attribute access is cheaper than dict.get with a
+# default on every field of every session during aggregation
+Session = namedtuple(
+    'Session',
+    ['model_used', 'total_cost', 'total_input_tokens', 'total_output_tokens', 'total_messages', 'start_time'],
+    defaults=['Unknown', 0.0, 0, 0, 0, '']
+)
+
+
+# Static layout for the usage-trends chart, shared across renders
+_TRENDS_LAYOUT = {
+    "title": {"text": "Usage Trends Over Time"},
+    "xaxis": {"title": {"text": "Date"}},
+    "yaxis": {"title": {"text": "Cost ($)"}, "side": "left", "color": "#FF6B6B"},
+    "yaxis2": {"title": {"text": "Sessions"}, "side": "right", "overlaying": "y", "color": "#4ECDC4"},
+    "hovermode": "x unified",
+    "showlegend": True
+}
+
+
+def _cached_figure(chart_method):
+    """Serve charts from a serialized-JSON cache keyed by the data fingerprint.
+
+    Rehydrating a cached JSON blob with go.Figure skips the per-property
+    validation passes that building the figure from scratch pays; the key
+    changes whenever new sessions land, so stale charts are never served.
+    Only the latest entry per chart is kept — old data versions never
+    recur, and the dashboard instance lives for the whole process, so
+    keeping history would just grow without bound. Only suitable for
+    charts derived from session data — budget charts key on the budget
+    rows directly (see generate_budget_status_chart).
+    """
+    @functools.wraps(chart_method)
+    def wrapper(self, *args, **kwargs):
+        key = hashlib.blake2b(
+            f"{args}|{sorted(kwargs.items())}|{self._data_version()}".encode(),
+            digest_size=16
+        ).hexdigest()
+
+        cached = self._figure_json_cache.get(chart_method.__name__)
+        if cached is not None and cached[0] == key:
+            _lazy_imports()
+            return go.Figure(json.loads(cached[1]))
+
+        fig = chart_method(self, *args, **kwargs)
+        self._figure_json_cache[chart_method.__name__] = (key, fig.to_json())
+        return fig
+
+    return wrapper
+
+
+def _as_records(sessions: List[Dict]) -> List[Session]:
+    """Convert raw session dicts into typed Session records once"""
+    return [
+        Session(
+            session.get('model_used', 'Unknown'),
+            session.get('total_cost', 0.0),
+            session.get('total_input_tokens', 0),
+            session.get('total_output_tokens', 0),
+            session.get('total_messages', 0),
+            session.get('start_time', '')
+        )
+        for session in sessions
+    ]
+
 
 class AnalyticsDashboard:
     """Analytics dashboard with charts and reporting"""
     
-    def __init__(self):
-        self.cost_engine = CostCalculationEngine()
-        self.budget_manager = BudgetManager()
-    
+    def __init__(self, supabase=None):
+        # A shared Supabase client is threaded through to both components
+        self.cost_engine = CostCalculationEngine(supabase)
+        self.budget_manager = BudgetManager(supabase)
+        self._sessions_df_cache = {}
+        self._figure_json_cache = {}
+
+    def _data_version(self) -> str:
+        """Fingerprint for figure cache keys; changes when new sessions land"""
+        try:
+            return self.cost_engine.supabase.get_latest_session_time() or ""
+        except Exception:
+            # Without a fingerprint, fall back to a 60s time bucket
+            return str(int(time.time() // 60))
+
+    @functools.lru_cache(maxsize=8)
+    def _cached_history(self, days: int, epoch_bucket: int) -> Dict:
+        """Fetch historical data once per (days, 60s bucket) instead of per chart"""
+        return self.cost_engine.get_historical_data(days)
+
+    def invalidate(self):
+        """Drop cached history and DataFrames (e.g. after new sessions land)"""
+        self._cached_history.cache_clear()
+        self._sessions_df_cache.clear()
+        self._figure_json_cache.clear()
+
+    def _load_sessions_df(self, days: int = 30) -> pd.DataFrame:
+        """Load session history as a columnar DataFrame, cached per lookback window"""
+        _lazy_imports()
+        epoch_bucket = int(time.time() // 60)
+        cache_key = (days, epoch_bucket)
+        cached = self._sessions_df_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        historical_data = self._cached_history(days, epoch_bucket)
+        df = pd.DataFrame(historical_data.get("sessions", []))
+
+        if not df.empty:
+            if "start_time" in df.columns:
+                df["date"] = df["start_time"].astype(str).str.slice(0, 10)
+            for column in ("total_cost", "total_input_tokens", "total_output_tokens", "total_messages"):
+                if column in df.columns:
+                    df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype("float32")
+
+        self._sessions_df_cache[cache_key] = df
+        return df
+
     def generate_cost_comparison_table(self) -> pd.DataFrame:
         """Generate the cost comparison table like the example"""
+        _lazy_imports()
         comparison_data = self.cost_engine.generate_cost_comparison_table()
         
         if not comparison_data:
@@ -56,12 +191,15 @@ class AnalyticsDashboard:
         
         return df[columns]
     
+    @_cached_figure
     def generate_usage_trends_chart(self, days: int = 30) -> go.Figure:
         """Generate usage trends chart"""
-        historical_data = self.cost_engine.get_historical_data(days)
-        sessions = historical_data.get("sessions", [])
-        
-        if not sessions:
+        _lazy_imports()
+        # Aggregation happens in the database (daily_usage_stats view), so we
+        # receive one row per day instead of every session
+        daily = self.cost_engine.get_daily_aggregates(days)
+
+        if not daily:
             # Return empty chart
             fig = go.Figure()
             fig.add_annotation(
@@ -70,78 +208,45 @@ class AnalyticsDashboard:
                 x=0.5, y=0.5, showarrow=False
             )
             return fig
-        
-        # Prepare data for chart
-        dates = []
-        daily_costs = []
-        daily_sessions = []
-        
-        # Group sessions by date
-        sessions_by_date = {}
-        for session in sessions:
-            session_date = session.get("start_time", "")[:10]  # Extract date
-            if session_date not in sessions_by_date:
-                sessions_by_date[session_date] = {"cost": 0, "sessions": 0}
-            
-            sessions_by_date[session_date]["cost"] += session.get("total_cost", 0)
-            sessions_by_date[session_date]["sessions"] += 1
-        
-        # Sort by date
-        for date_str in sorted(sessions_by_date.keys()):
-            dates.append(date_str)
-            daily_costs.append(sessions_by_date[date_str]["cost"])
-            daily_sessions.append(sessions_by_date[date_str]["sessions"])
-        
-        # Create chart
-        fig = go.Figure()
-        
-        # Add cost line
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=daily_costs,
-            mode='lines+markers',
-            name='Daily Cost ($)',
-            yaxis='y',
-            line=dict(color='#FF6B6B')
-        ))
-        
-        # Add sessions bar
-        fig.add_trace(go.Bar(
-            x=dates,
-            y=daily_sessions,
-            name='Daily Sessions',
-            yaxis='y2',
-            marker_color='#4ECDC4',
-            opacity=0.7
-        ))
-        
-        # Update layout
-        fig.update_layout(
-            title="Usage Trends Over Time",
-            xaxis_title="Date",
-            yaxis=dict(
-                title="Cost ($)",
-                side="left",
-                color='#FF6B6B'
-            ),
-            yaxis2=dict(
-                title="Sessions",
-                side="right",
-                overlaying="y",
-                color='#4ECDC4'
-            ),
-            hovermode='x unified',
-            showlegend=True
-        )
-        
-        return fig
+
+        dates = [str(row["date"]) for row in daily]
+        daily_costs = [row["cost"] for row in daily]
+        daily_sessions = [row["sessions"] for row in daily]
+
+        # Build the figure from a plain dict spec — skips the per-property
+        # graph_objs validator passes that go.Scatter/go.Bar construction pays
+        return go.Figure({
+            "data": [
+                {
+                    "type": "scatter",
+                    "x": dates,
+                    "y": daily_costs,
+                    "mode": "lines+markers",
+                    "name": "Daily Cost ($)",
+                    "yaxis": "y",
+                    "line": {"color": "#FF6B6B"}
+                },
+                {
+                    "type": "bar",
+                    "x": dates,
+                    "y": daily_sessions,
+                    "name": "Daily Sessions",
+                    "yaxis": "y2",
+                    "marker": {"color": "#4ECDC4"},
+                    "opacity": 0.7
+                }
+            ],
+            "layout": _TRENDS_LAYOUT
+        })
     
+    @_cached_figure
     def generate_model_usage_pie_chart(self, days: int = 30) -> go.Figure:
         """Generate model usage pie chart"""
-        historical_data = self.cost_engine.get_historical_data(days)
-        sessions = historical_data.get("sessions", [])
-        
-        if not sessions:
+        _lazy_imports()
+        # Aggregation happens in the database (model_daily_stats view)
+        model_usage = self.cost_engine.get_model_aggregates(days)
+
+        if not model_usage:
             fig = go.Figure()
             fig.add_annotation(
                 text="No data available",
@@ -149,32 +254,20 @@ class AnalyticsDashboard:
                 x=0.5, y=0.5, showarrow=False
             )
             return fig
-        
-        # Count model usage
-        model_usage = {}
-        for session in sessions:
-            model = session.get("model_used", "Unknown")
-            if model not in model_usage:
-                model_usage[model] = {"sessions": 0, "cost": 0}
-            
-            model_usage[model]["sessions"] += 1
-            model_usage[model]["cost"] += session.get("total_cost", 0)
-        
+
         # Prepare data for pie chart
-        labels = []
-        values = []
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
-        
-        for i, (model, data) in enumerate(model_usage.items()):
-            labels.append(f"{model}\n({data['sessions']} sessions)")
-            values.append(data["cost"])
-        
+        labels = [
+            f"{row['model_used']}\n({row['sessions']} sessions)"
+            for row in model_usage
+        ]
+        values = [row["total_cost"] for row in model_usage]
+
         # Create pie chart
         fig = go.Figure(data=[go.Pie(
             labels=labels,
             values=values,
             hole=0.3,
-            marker_colors=colors[:len(labels)]
+            marker_colors=list(islice(cycle(COLORS), len(labels)))
         )])
         
         fig.update_layout(
@@ -186,8 +279,29 @@ class AnalyticsDashboard:
     
     def generate_budget_status_chart(self) -> go.Figure:
         """Generate budget status chart"""
+        _lazy_imports()
         budgets = self.budget_manager.get_all_budgets()
-        
+
+        # Budget spending moves without new session rows landing, so the
+        # session-based _data_version() cannot key this chart. Fingerprint
+        # the budget rows themselves instead — they have to be fetched to
+        # render anyway, and the cache still skips the figure rebuild.
+        state = tuple(
+            (b.get("budget_type"), b.get("current_spent"), b.get("limit_amount"))
+            for b in budgets
+        )
+        key = hashlib.blake2b(f"{state}".encode(), digest_size=16).hexdigest()
+
+        cached = self._figure_json_cache.get("generate_budget_status_chart")
+        if cached is not None and cached[0] == key:
+            return go.Figure(json.loads(cached[1]))
+
+        fig = self._build_budget_status_chart(budgets)
+        self._figure_json_cache["generate_budget_status_chart"] = (key, fig.to_json())
+        return fig
+
+    def _build_budget_status_chart(self, budgets: List[Dict]) -> go.Figure:
+        """Build the budget status figure from already-fetched budget rows"""
         if not budgets:
             fig = go.Figure()
             fig.add_annotation(
@@ -251,46 +365,54 @@ class AnalyticsDashboard:
     
     def generate_cost_efficiency_report(self) -> Dict:
         """Generate cost efficiency report"""
-        historical_data = self.cost_engine.get_historical_data(30)
+        historical_data = self._cached_history(30, int(time.time() // 60))
         sessions = historical_data.get("sessions", [])
         
         if not sessions:
             return {"message": "No data available for analysis"}
-        
-        # Calculate metrics
-        total_cost = sum(session.get("total_cost", 0) for session in sessions)
+
+        # Single pass over sessions: accumulate overall totals and per-model
+        # counters ([sessions, cost, tokens, messages]) at the same time
+        total_cost = 0
+        total_messages = 0
+        total_tokens = 0
         total_sessions = len(sessions)
-        total_messages = sum(session.get("total_messages", 0) for session in sessions)
-        total_tokens = sum(session.get("total_input_tokens", 0) + session.get("total_output_tokens", 0) for session in sessions)
-        
+        model_counters = {}
+
+        for session in _as_records(sessions):
+            cost = session.total_cost
+            messages = session.total_messages
+            tokens = session.total_input_tokens + session.total_output_tokens
+
+            total_cost += cost
+            total_messages += messages
+            total_tokens += tokens
+
+            counters = model_counters.setdefault(session.model_used, [0, 0, 0, 0])
+            counters[0] += 1
+            counters[1] += cost
+            counters[2] += tokens
+            counters[3] += messages
+
         # Calculate averages
         avg_cost_per_session = total_cost / total_sessions if total_sessions > 0 else 0
         avg_messages_per_session = total_messages / total_sessions if total_sessions > 0 else 0
         avg_cost_per_message = total_cost / total_messages if total_messages > 0 else 0
         avg_cost_per_token = total_cost / total_tokens if total_tokens > 0 else 0
-        
-        # Model efficiency analysis
-        model_efficiency = {}
-        for session in sessions:
-            model = session.get("model_used", "Unknown")
-            if model not in model_efficiency:
-                model_efficiency[model] = {
-                    "sessions": 0,
-                    "total_cost": 0,
-                    "total_tokens": 0,
-                    "total_messages": 0
-                }
-            
-            model_efficiency[model]["sessions"] += 1
-            model_efficiency[model]["total_cost"] += session.get("total_cost", 0)
-            model_efficiency[model]["total_tokens"] += session.get("total_input_tokens", 0) + session.get("total_output_tokens", 0)
-            model_efficiency[model]["total_messages"] += session.get("total_messages", 0)
-        
-        # Calculate efficiency metrics for each model
-        for model, data in model_efficiency.items():
-            data["cost_per_session"] = data["total_cost"] / data["sessions"] if data["sessions"] > 0 else 0
-            data["cost_per_message"] = data["total_cost"] / data["total_messages"] if data["total_messages"] > 0 else 0
-            data["cost_per_token"] = data["total_cost"] / data["total_tokens"] if data["total_tokens"] > 0 else 0
+
+        # Convert counters back into the dict shape with derived efficiency metrics
+        model_efficiency = {
+            model: {
+                "sessions": n_sessions,
+                "total_cost": cost,
+                "total_tokens": tokens,
+                "total_messages": messages,
+                "cost_per_session": cost / n_sessions if n_sessions > 0 else 0,
+                "cost_per_message": cost / messages if messages > 0 else 0,
+                "cost_per_token": cost / tokens if tokens > 0 else 0
+            }
+            for model, (n_sessions, cost, tokens, messages) in model_counters.items()
+        }
         
         # Find most efficient model
         most_efficient_model = min(model_efficiency.items(), key=lambda x: x[1]["cost_per_token"])[0] if model_efficiency else "N/A"
@@ -312,34 +434,41 @@ class AnalyticsDashboard:
     
     def _generate_recommendations(self, model_efficiency: Dict, avg_cost_per_token: float) -> List[str]:
         """Generate cost optimization recommendations"""
+        import numpy as np
+
         recommendations = []
-        
+
         if not model_efficiency:
             return ["No usage data available for recommendations"]
-        
-        # Find most and least efficient models
-        sorted_models = sorted(model_efficiency.items(), key=lambda x: x[1]["cost_per_token"])
-        
-        if len(sorted_models) > 1:
-            most_efficient = sorted_models[0]
-            least_efficient = sorted_models[-1]
-            
-            efficiency_ratio = least_efficient[1]["cost_per_token"] / most_efficient[1]["cost_per_token"]
-            
-            if efficiency_ratio > 2:
-                recommendations.append(
-                    f"Consider using {most_efficient[0]} more often. "
-                    f"It's {efficiency_ratio:.1f}x more cost-efficient than {least_efficient[0]}"
-                )
-        
+
+        # One model x cost_per_token vector; argmin/argmax and the expensive-
+        # model mask replace the Python-level sort and comparison loops
+        names = list(model_efficiency)
+        cost_per_token = np.fromiter(
+            (data["cost_per_token"] for data in model_efficiency.values()),
+            dtype=np.float64, count=len(names)
+        )
+
+        if len(names) > 1:
+            most_efficient = names[cost_per_token.argmin()]
+            least_efficient = names[cost_per_token.argmax()]
+
+            if cost_per_token.min() > 0:
+                efficiency_ratio = cost_per_token.max() / cost_per_token.min()
+
+                if efficiency_ratio > 2:
+                    recommendations.append(
+                        f"Consider using {most_efficient} more often. "
+                        f"It's {efficiency_ratio:.1f}x more cost-efficient than {least_efficient}"
+                    )
+
         # Check for high usage of expensive models
-        for model, data in model_efficiency.items():
-            if data["cost_per_token"] > avg_cost_per_token * 1.5:
-                recommendations.append(
-                    f"{model} is significantly more expensive than average. "
-                    f"Consider using it only for complex tasks."
-                )
-        
+        recommendations.extend(
+            f"{names[i]} is significantly more expensive than average. "
+            f"Consider using it only for complex tasks."
+            for i in np.nonzero(cost_per_token > avg_cost_per_token * 1.5)[0]
+        )
+
         # General recommendations
         if avg_cost_per_token > 0.0001:  # If cost per token is high
             recommendations.append("Consider using smaller models for simple tasks to reduce costs")
@@ -351,26 +480,42 @@ class AnalyticsDashboard:
     
     def export_analytics_data(self, format: str = "csv") -> str:
         """Export analytics data in specified format"""
-        historical_data = self.cost_engine.get_historical_data(30)
-        sessions = historical_data.get("sessions", [])
-        
-        if not sessions:
+        _lazy_imports()
+        df = self._load_sessions_df(30).copy()
+
+        if df.empty:
             return "No data available for export"
-        
-        # Create DataFrame
-        df = pd.DataFrame(sessions)
-        
-        # Format timestamp
+
+        # The date column is synthesized by _load_sessions_df for chart
+        # grouping; exports carry the raw session fields only
+        df = df.drop(columns=["date"], errors="ignore")
+
+        # Columnar dtypes: small ints for token/message counts, category for
+        # the repeated model names — much cheaper to hold and serialize
+        dtypes = {
+            'total_cost': 'float32',
+            'total_input_tokens': 'int32',
+            'total_output_tokens': 'int32',
+            'total_messages': 'int16',
+            'model_used': 'category'
+        }
+        df = df.astype({col: dt for col, dt in dtypes.items() if col in df.columns})
+
+        # start_time is already ISO-formatted; slice instead of a
+        # to_datetime/strftime round-trip
         if 'start_time' in df.columns:
-            df['start_time'] = pd.to_datetime(df['start_time']).dt.strftime('%Y-%m-%d %H:%M:%S')
-        
+            df['start_time'] = df['start_time'].astype(str).str.slice(0, 19).str.replace('T', ' ')
+
         if format.lower() == "csv":
             filename = f"analytics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
+            df.to_csv(filename, index=False, chunksize=10000)
             return f"Data exported to {filename}"
         elif format.lower() == "json":
             filename = f"analytics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            df.to_json(filename, orient='records', date_format='iso')
+            # A single JSON array, as the baseline export produced —
+            # consumers parse the file as one document, not NDJSON
+            with open(filename, 'w', buffering=1 << 20) as f:
+                df.to_json(f, orient='records', date_format='iso')
             return f"Data exported to {filename}"
         else:
             return "Unsupported format. Use 'csv' or 'json'"
@@ -3,63 +3,202 @@ Backend logic for Travel Texas AI Agent
 Handles API calls, data processing, and business logic
 """
 
-import requests
-import json
+import functools
+import httpx
+import orjson
 import time
-import tiktoken
 import os
 import streamlit as st
 import asyncio
 import aiohttp
-from typing import Dict, AsyncGenerator
+from types import MappingProxyType
+from typing import Dict, AsyncGenerator, Optional
 from dotenv import load_dotenv
-from agent_prompt import TEXAS_TOURISM_AGENT_PROMPT, WELCOME_MESSAGE
-from cost_engine import CostCalculationEngine
-from budget_manager import BudgetManager
-from analytics_dashboard import AnalyticsDashboard
+from agent_prompt import get_agent_prompt, WELCOME_MESSAGE
+from response_cache import ResponseCache, context_fingerprint, replay_as_stream
 
 # Load environment variables (for local development)
 load_dotenv()
 
+# Input-token budget for history trimming, tunable per deployment
+MAX_HISTORY_TOKENS = int(os.getenv("MAX_HISTORY_TOKENS", "4000"))
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_token_count(text, encoding):
+    """Exact-match token-count cache.
+
+    The system prompt, welcome message, and repeated user phrases get
+    tokenized over and over; identical strings come back from the cache
+    instead of re-running BPE. Module-level so `self` isn't part of the key.
+    """
+    return len(encoding.encode(text))
+
+
+def _iter_sse_lines(response):
+    """Yield SSE lines from an httpx streaming response as raw bytes.
+
+    Framing on bytes skips the per-line UTF-8 decode and str allocation that
+    iter_lines pays for every streamed chunk; orjson parses bytes directly.
+    """
+    buffer = b""
+    for chunk in response.iter_raw():
+        buffer += chunk
+        while (newline := buffer.find(b"\n")) != -1:
+            line = buffer[:newline].rstrip(b"\r")
+            buffer = buffer[newline + 1:]
+            if line:
+                yield line
+
+
+def _with_prompt_cache(messages, model):
+    """Mark the static system prefix cacheable for Claude-family models.
+
+    Anthropic bills cache reads at a ~90% discount once the prefix carries a
+    cache_control block; OpenAI-style models cache long prefixes automatically,
+    so messages pass through untouched for everything else.
+    """
+    if not model.startswith('anthropic/') or not messages:
+        return messages
+
+    first = messages[0]
+    if first.get('role') != 'system' or not isinstance(first.get('content'), str):
+        return messages
+
+    cached_system = {
+        "role": "system",
+        "content": [{
+            "type": "text",
+            "text": first['content'],
+            "cache_control": {"type": "ephemeral"}
+        }]
+    }
+    return [cached_system] + messages[1:]
+
 
 class TravelTexasBackend:
     """Backend service for Travel Texas AI Agent"""
     
     def __init__(self):
         self.config_file = "models_config.json"
-        self.models_config = TravelTexasBackend.load_models_config()
-        self.available_models = self.models_config.get("models", {})
-        self.default_model = self.models_config.get("default_model", "openai/gpt-4.1-mini")
-        self.system_prompt = TEXAS_TOURISM_AGENT_PROMPT
-        
-        # Initialize cost management system with shared Supabase client
+        self.system_prompt = get_agent_prompt()
+        self._config_version = None
+        self._apply_models_config(TravelTexasBackend.load_models_config(),
+                                  self._models_config_version())
+
+    def _apply_models_config(self, config, version):
+        """Build every config-derived table from a freshly loaded config.
+
+        Called once at construction and again whenever the config file
+        changes on disk; everything snapshotted from pricing lives here
+        so a reload can never leave a table on old rates.
+        """
+        self.models_config = config
+        self.available_models = config.get("models", {})
+        self.default_model = config.get("default_model", "openai/gpt-4.1-mini")
+
+        # Flat cost-per-token tables computed once per config load, so
+        # calculate_cost is two multiplies instead of nested pricing lookups
+        self._in_rate = {}
+        self._out_rate = {}
+        for model_id, model_info in self.available_models.items():
+            pricing = model_info.get('pricing', {})
+            self._in_rate[model_id] = pricing.get('input_tokens_per_million', 0) / 1_000_000
+            self._out_rate[model_id] = pricing.get('output_tokens_per_million', 0) / 1_000_000
+
+        # Full per-model configs prebuilt and frozen once per load, so
+        # get_model_config is a single dict lookup per render
+        self._model_configs = {
+            model_id: MappingProxyType({
+                'name': 'Texas Tourism Agent',
+                'display_name': model_info['name'],
+                'model': model_id,  # Use the actual model ID
+                'emoji': model_info['emoji'],
+                'provider': model_info.get('provider', 'Unknown'),
+                'description': model_info.get('description', ''),
+                'pricing': model_info.get('pricing', {}),
+                'capabilities': model_info.get('capabilities', []),
+                'max_tokens': model_info.get('max_tokens', 2000),
+                'color': '#FF6B6B',
+                'cta_text': 'Explore Texas Now!',
+                'cta_url': 'https://www.traveltexas.com',
+                'system_prompt': self.system_prompt
+            })
+            for model_id, model_info in self.available_models.items()
+        }
+
+        # Comparison results are rebuilt only after a config reload (and,
+        # for the cost table, when a session ends with new usage); the
+        # calculate_cost memo also snapshots rates, so it resets too
+        self._comparison_cache = None
+        self._cost_table_cache = None
+        self._last_cost_key = None
+        self._last_cost_data = None
+        self._config_version = version
+
+        # Persistent HTTP/2 client: keep-alive and multiplexing skip the
+        # TCP/TLS handshake on every conversation turn after the first,
+        # which dominates time-to-first-token
+        self._http = httpx.Client(
+            http2=True,
+            timeout=30.0,
+            headers={
+                "Content-Type": "application/json",
+                "X-Title": "Travel Texas Chat Agent"
+            }
+        )
+
+        # Repeated questions are replayed from here without an API call
+        self._response_cache = ResponseCache()
+
+    # The cost-management stack (and its Supabase client) is constructed on
+    # first use, so callers that never touch cost tracking don't pay the
+    # component import time or the network-client setup at startup
+
+    @functools.cached_property
+    def _supabase(self):
+        """Shared Supabase client for all cost components"""
         from supabase_client import SupabaseClient
-        shared_supabase = SupabaseClient()
-        
-        self.cost_engine = CostCalculationEngine()
-        self.cost_engine.supabase = shared_supabase
-        
-        self.budget_manager = BudgetManager()
-        self.budget_manager.supabase = shared_supabase
-        
-        self.analytics_dashboard = AnalyticsDashboard()
-        self.analytics_dashboard.cost_engine.supabase = shared_supabase
-        self.analytics_dashboard.budget_manager.supabase = shared_supabase
-    
-        
+        return SupabaseClient()
+
+    @functools.cached_property
+    def cost_engine(self):
+        from cost_engine import CostCalculationEngine
+        return CostCalculationEngine(self._supabase)
+
+    @functools.cached_property
+    def budget_manager(self):
+        from budget_manager import BudgetManager
+        return BudgetManager(self._supabase)
+
+    @functools.cached_property
+    def analytics_dashboard(self):
+        from analytics_dashboard import AnalyticsDashboard
+        return AnalyticsDashboard(self._supabase)
+
+    @functools.cached_property
+    def _encoding(self):
+        """tiktoken encoding, built on the first token count"""
+        import tiktoken
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"Warning: could not load tiktoken encoding ({e}). Using character-based estimates.")
+            return None
+
     @staticmethod
-    @st.cache_data
+    @st.cache_data(ttl=300, show_spinner=False)
     def load_models_config():
         """Load models configuration from JSON file"""
         config_file = "models_config.json"
         try:
             config_path = os.path.join(os.path.dirname(__file__), config_file)
-            with open(config_path, 'r') as f:
-                return json.load(f)
+            with open(config_path, 'rb') as f:
+                return orjson.loads(f.read())
         except FileNotFoundError:
             print(f"Warning: {config_file} not found. Using default models.")
             return TravelTexasBackend.get_default_config()
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"Error parsing {config_file}: {e}. Using default models.")
             return TravelTexasBackend.get_default_config()
     
@@ -87,58 +226,79 @@ class TravelTexasBackend:
 
     def get_available_models(self):
         """Get list of available AI models"""
+        # The sidebar calls this every rerun, which keeps the snapshot
+        # (and the rate tables derived from it) tracking the file
+        self._maybe_reload_config()
         return self.available_models
 
     def get_model_config(self, selected_model):
         """Get configuration for selected model"""
-        model_info = self.available_models[selected_model]
-        
-        return {
-            'name': 'Texas Tourism Agent',
-            'display_name': model_info['name'],
-            'model': selected_model,  # Use the actual model ID
-            'emoji': model_info['emoji'],
-            'provider': model_info.get('provider', 'Unknown'),
-            'description': model_info.get('description', ''),
-            'pricing': model_info.get('pricing', {}),
-            'capabilities': model_info.get('capabilities', []),
-            'color': '#FF6B6B',
-            'cta_text': 'Explore Texas Now!',
-            'cta_url': 'https://www.traveltexas.com',
-            'system_prompt': self.system_prompt
-        }
+        return self._model_configs[selected_model]
     
-    def calculate_cost(self, model_id, input_tokens, output_tokens):
+    # Prompt-cache hits are billed at a fraction of the normal input rate
+    # (providers typically charge ~10% for cached reads)
+    CACHED_INPUT_DISCOUNT = 0.1
+
+    def calculate_cost(self, model_id, input_tokens, output_tokens, cached_input_tokens=0):
         """Calculate the cost for a given model and token usage"""
-        if model_id not in self.available_models:
+        # Sidebar reruns repeat the same (model, tokens) triple between
+        # turns; reuse the previous result dict instead of rebuilding it
+        key = (model_id, input_tokens, output_tokens, cached_input_tokens)
+        if key == self._last_cost_key:
+            return self._last_cost_data
+
+        input_rate = self._in_rate.get(model_id)
+        if input_rate is None:
             return 0.0
-        
-        model_info = self.available_models[model_id]
-        pricing = model_info.get('pricing', {})
-        
-        input_cost_per_million = pricing.get('input_tokens_per_million', 0)
-        output_cost_per_million = pricing.get('output_tokens_per_million', 0)
-        
-        # Calculate costs
-        input_cost = (input_tokens / 1_000_000) * input_cost_per_million
-        output_cost = (output_tokens / 1_000_000) * output_cost_per_million
-        
+
+        # Calculate costs from the precomputed per-token rates; tokens the
+        # provider served from its prompt cache get the discounted rate
+        input_cost = (input_tokens - cached_input_tokens) * input_rate \
+            + cached_input_tokens * input_rate * self.CACHED_INPUT_DISCOUNT
+        output_cost = output_tokens * self._out_rate[model_id]
+
         total_cost = input_cost + output_cost
-        
-        return {
+
+        cost_data = {
             'input_cost': input_cost,
             'output_cost': output_cost,
             'total_cost': total_cost,
             'input_tokens': input_tokens,
             'output_tokens': output_tokens
         }
+        self._last_cost_key = key
+        self._last_cost_data = cost_data
+        return cost_data
     
     def estimate_conversation_cost(self, model_id, estimated_input_tokens=100, estimated_output_tokens=400):
         """Estimate cost for a typical conversation"""
         return self.calculate_cost(model_id, estimated_input_tokens, estimated_output_tokens)
     
+    def _models_config_version(self):
+        """Version token for the config snapshot — changes when the file does"""
+        try:
+            return os.path.getmtime(os.path.join(os.path.dirname(__file__), self.config_file))
+        except OSError:
+            return 0.0
+
+    def _maybe_reload_config(self):
+        """Re-read the models config when the file has changed on disk.
+
+        The backend instance is cached for the process lifetime, so the
+        TTL on load_models_config alone never refreshes the derived rate
+        and config tables — the reload has to be driven from here.
+        """
+        version = self._models_config_version()
+        if version != self._config_version:
+            TravelTexasBackend.load_models_config.clear()
+            self._apply_models_config(TravelTexasBackend.load_models_config(), version)
+
     def get_model_comparison(self):
         """Get comparison data for all available models"""
+        self._maybe_reload_config()
+        if self._comparison_cache is not None:
+            return self._comparison_cache
+
         comparison = []
         for model_id, model_info in self.available_models.items():
             if model_info.get('available', True):
@@ -159,74 +319,147 @@ class TravelTexasBackend:
         
         # Sort by estimated conversation cost (cheapest first)
         comparison.sort(key=lambda x: x['estimated_conversation_cost'])
+
+        self._comparison_cache = comparison
         return comparison
 
     def count_tokens(self, text, model_name="gpt-3.5-turbo"):
-        """Estimate token count using tiktoken"""
-        try:
-            encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-            return len(encoding.encode(text))
-        except:
-            # Fallback estimation: roughly 4 characters per token
-            return len(text) // 4
+        """Estimate token count using the shared tiktoken encoding"""
+        encoding = self._encoding
+        if encoding is not None:
+            return _cached_token_count(text, encoding)
+        # Fallback estimation: roughly 4 characters per token
+        return len(text) // 4
+
+    def count_tokens_batch(self, texts):
+        """Estimate token counts for several texts in one tokenizer call"""
+        encoding = self._encoding
+        if encoding is not None:
+            # encode_batch runs the BPE passes in parallel rust threads
+            return [len(tokens) for tokens in encoding.encode_batch(list(texts))]
+        return [len(text) // 4 for text in texts]
+
+    def trim_history(self, messages, max_history_tokens=None, system=None):
+        """Drop the oldest turns that exceed the input token budget.
+
+        The system message is always kept, as is the newest turn even if
+        it alone exceeds the budget. This bounds per-turn input cost,
+        which otherwise grows linearly with conversation length.
+
+        Callers may pass ``system`` separately so the final payload list
+        is built only once here; a leading system message inside
+        ``messages`` is also recognized.
+        """
+        if not messages:
+            return [system] if system else []
+
+        if max_history_tokens is None:
+            max_history_tokens = MAX_HISTORY_TOKENS
+
+        if system is None and messages[0].get('role') == 'system':
+            system = messages[0]
+            history = messages[1:]
+        else:
+            history = messages
+
+        kept = []
+        used = 0
+        for message in reversed(history):
+            content = message.get('content')
+            tokens = self.count_tokens(content) if isinstance(content, str) else 0
+            if kept and used + tokens > max_history_tokens:
+                break
+            kept.append(message)
+            used += tokens
+
+        kept.reverse()
+        return [system, *kept] if system else kept
 
-    def call_openrouter_api_streaming(self, messages, model_config):
+    def call_openrouter_api_streaming(self, messages, model_config, max_tokens=None):
         """Call OpenRouter API with streaming - yields content chunks and returns token usage"""
         # Store token usage data for this call
         self._last_token_usage = None
+        self._last_reply_cached = False
         # Get API key from environment variables (works for both local and Streamlit Cloud)
         api_key = os.getenv('OPENROUTER_API_KEY')
         
         if not api_key:
             raise ValueError("OpenRouter API key not found in environment variables")
         
+        # Serve repeated questions straight from the response cache —
+        # no network round-trip, no output tokens billed. Entries are
+        # scoped to the preceding conversation so context-dependent
+        # follow-ups never replay a reply from a different chat.
+        last_user = None
+        cache_context = ""
+        for i in range(len(messages) - 1, -1, -1):
+            message = messages[i]
+            if message.get('role') == 'user' and isinstance(message.get('content'), str):
+                last_user = message['content']
+                cache_context = context_fingerprint(messages[:i])
+                break
+        if last_user:
+            cached_reply = self._response_cache.get(model_config['model'], last_user,
+                                                    context=cache_context)
+            if cached_reply is not None:
+                self._last_reply_cached = True
+                yield from replay_as_stream(cached_reply)
+                return
+
         url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "X-Title": "Travel Texas Chat Agent"
-        }
 
         data = {
             "model": model_config['model'],
-            "messages": messages,
+            "messages": _with_prompt_cache(messages, model_config['model']),
             "temperature": 0.7,
-            "max_tokens": 2000,
-            "stream": True
+            "top_p": 0.9,
+            # Output tokens drive cost; cap from the model config with a
+            # per-call override instead of a hardcoded budget
+            "max_tokens": max_tokens if max_tokens is not None else model_config.get('max_tokens', 2000),
+            "stream": True,
+            # Ask for exact usage in the final SSE event so the UI never
+            # has to fall back to local token estimation
+            "stream_options": {"include_usage": True}
         }
 
         token_usage = None
-        
+        reply_parts = []
+
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=15, stream=True)
-            response.raise_for_status()
-            
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('data: '):
-                        data_str = line_str[6:]  # Remove 'data: ' prefix
-                        if data_str.strip() == '[DONE]':
+            with self._http.stream("POST", url, headers={"Authorization": f"Bearer {api_key}"},
+                                   json=data) as response:
+                response.raise_for_status()
+
+                for line in _iter_sse_lines(response):
+                    if line.startswith(b'data: '):
+                        payload = line[6:]  # Remove 'data: ' prefix
+                        if payload == b'[DONE]':
                             break
                         try:
-                            data_json = json.loads(data_str)
-                            
+                            data_json = orjson.loads(payload)
+
                             # Check for token usage data (usually in the last chunk)
                             if 'usage' in data_json:
                                 token_usage = data_json['usage']
-                            
+
                             if 'choices' in data_json and len(data_json['choices']) > 0:
                                 delta = data_json['choices'][0].get('delta', {})
                                 if 'content' in delta:
+                                    reply_parts.append(delta['content'])
                                     yield delta['content']  # Stream the content
-                        except json.JSONDecodeError:
+                        except orjson.JSONDecodeError:
                             continue
-            
+
             # Store token usage data for later access
             if token_usage:
                 self._last_token_usage = token_usage
-                            
-        except requests.exceptions.RequestException as e:
+
+            # Only complete responses are cached; errors raise past this
+            if last_user and reply_parts:
+                self._response_cache.put(model_config['model'], last_user, ''.join(reply_parts),
+                                         context=cache_context)
+
+        except httpx.HTTPError as e:
             yield f"API Error: {str(e)}"
         except Exception as e:
             yield f"Error: {str(e)}"
@@ -235,7 +468,15 @@ class TravelTexasBackend:
         """Get the token usage data from the last API call"""
         return getattr(self, '_last_token_usage', None)
 
-    async def call_openrouter_api_streaming_async(self, messages, model_config) -> AsyncGenerator[str, None]:
+    def was_last_reply_cached(self):
+        """True when the last streaming call replayed a cached reply.
+
+        Replayed turns never reach OpenRouter, so nothing was billed and
+        they must not be logged into cost tracking at full price.
+        """
+        return getattr(self, '_last_reply_cached', False)
+
+    async def call_openrouter_api_streaming_async(self, messages, model_config, max_tokens=None) -> AsyncGenerator[str, None]:
         """Call OpenRouter API with async streaming - yields content chunks"""
         # Get API key from environment variables (works for both local and Streamlit Cloud)
         api_key = os.getenv('OPENROUTER_API_KEY')
@@ -252,10 +493,12 @@ class TravelTexasBackend:
 
         data = {
             "model": model_config['model'],
-            "messages": messages,
+            "messages": _with_prompt_cache(messages, model_config['model']),
             "temperature": 0.7,
-            "max_tokens": 2000,
-            "stream": True
+            "top_p": 0.9,
+            "max_tokens": max_tokens if max_tokens is not None else model_config.get('max_tokens', 2000),
+            "stream": True,
+            "stream_options": {"include_usage": True}
         }
 
         try:
@@ -265,18 +508,17 @@ class TravelTexasBackend:
                     
                     async for line in response.content:
                         if line:
-                            line_str = line.decode('utf-8')
-                            if line_str.startswith('data: '):
-                                data_str = line_str[6:]  # Remove 'data: ' prefix
-                                if data_str.strip() == '[DONE]':
+                            if line.startswith(b'data: '):
+                                payload = line[6:].strip()  # Remove 'data: ' prefix
+                                if payload == b'[DONE]':
                                     break
                                 try:
-                                    data_json = json.loads(data_str)
+                                    data_json = orjson.loads(payload)
                                     if 'choices' in data_json and len(data_json['choices']) > 0:
                                         delta = data_json['choices'][0].get('delta', {})
                                         if 'content' in delta:
                                             yield delta['content']
-                                except json.JSONDecodeError:
+                                except orjson.JSONDecodeError:
                                     continue
                                     
         except aiohttp.ClientError as e:
@@ -292,9 +534,10 @@ class TravelTexasBackend:
         """Validate if API key is provided"""
         return bool(api_key and api_key.strip())
 
-    def estimate_token_usage(self, text):
-        """Estimate token usage for a given text"""
-        total_tokens = self.count_tokens(text)
+    def estimate_token_usage(self, text, total_tokens=None):
+        """Estimate token usage for a given text, reusing a precomputed count if given"""
+        if total_tokens is None:
+            total_tokens = self.count_tokens(text)
         return {
             'input_tokens': total_tokens // 2,
             'output_tokens': total_tokens // 2,
@@ -306,14 +549,18 @@ class TravelTexasBackend:
         """Start a new cost tracking session"""
         return self.cost_engine.start_session(model_used)
     
-    def log_user_message(self, message: str, model_used: str) -> Dict:
-        """Log a user message and calculate cost"""
-        input_tokens = self.count_tokens(message)
+    def log_user_message(self, message: str, model_used: str, token_count: Optional[int] = None) -> Dict:
+        """Log a user message and calculate cost.
+
+        Callers that already know the token count (e.g. from API usage data)
+        can pass it and skip the local tokenization.
+        """
+        input_tokens = token_count if token_count is not None else self.count_tokens(message)
         return self.cost_engine.log_message("user", input_tokens, 0, model_used, message)
-    
-    def log_assistant_message(self, message: str, model_used: str) -> Dict:
+
+    def log_assistant_message(self, message: str, model_used: str, token_count: Optional[int] = None) -> Dict:
         """Log an assistant message and calculate cost"""
-        output_tokens = self.count_tokens(message)
+        output_tokens = token_count if token_count is not None else self.count_tokens(message)
         return self.cost_engine.log_message("assistant", 0, output_tokens, model_used, message)
     
     def get_session_summary(self) -> Dict:
@@ -323,10 +570,18 @@ class TravelTexasBackend:
     def end_cost_tracking_session(self):
         """End the current cost tracking session"""
         self.cost_engine.end_session()
-    
+        # New usage data lands when a session ends
+        self._cost_table_cache = None
+
     def get_cost_comparison_table(self):
         """Get cost comparison table data"""
-        return self.cost_engine.generate_cost_comparison_table()
+        self._maybe_reload_config()
+        if self._cost_table_cache is not None:
+            return self._cost_table_cache
+
+        table = self.cost_engine.generate_cost_comparison_table()
+        self._cost_table_cache = table
+        return table
     
     def get_budget_status(self, budget_type: str = "daily") -> Dict:
         """Get budget status"""
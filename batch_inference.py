@@ -0,0 +1,129 @@
+"""
+Batch inference helpers for Travel Texas AI Agent
+Coalesces many prompts into concurrent OpenRouter requests so the provider's
+continuous batching can schedule them together instead of serially
+"""
+
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from agent_prompt import get_agent_prompt, PROMPT_CACHE_KEY
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+async def _generate_one(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                        prompt: str, model: str, max_tokens: int) -> str:
+    """Run a single non-streaming completion, bounded by the shared semaphore"""
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": get_agent_prompt()},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+        # Stable cache key so the shared system prompt hits the provider's
+        # prompt cache across all requests in the batch
+        "prompt_cache_key": PROMPT_CACHE_KEY
+    }
+
+    async with semaphore:
+        try:
+            async with session.post(OPENROUTER_URL, json=data,
+                                    timeout=aiohttp.ClientTimeout(total=60)) as response:
+                response.raise_for_status()
+                payload = await response.json()
+                return payload["choices"][0]["message"]["content"]
+
+        except aiohttp.ClientError as e:
+            return f"API Error: {str(e)}"
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+
+async def batch_generate(prompts: List[str], model: str = "google/gemini-2.5-flash",
+                         max_tokens: int = 2000, max_concurrency: int = 16) -> List[str]:
+    """Generate completions for many prompts concurrently.
+
+    All prompts are submitted at once (bounded by max_concurrency) so the
+    provider can batch them server-side; results come back in input order.
+    """
+    api_key = os.getenv('OPENROUTER_API_KEY')
+
+    if not api_key:
+        raise ValueError("OpenRouter API key not found in environment variables")
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "X-Title": "Travel Texas Chat Agent"
+    }
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with aiohttp.ClientSession(headers=headers) as session:
+        tasks = [
+            _generate_one(session, semaphore, prompt, model, max_tokens)
+            for prompt in prompts
+        ]
+        return list(await asyncio.gather(*tasks))
+
+
+def batch_generate_sync(prompts: List[str], model: str = "google/gemini-2.5-flash",
+                        max_tokens: int = 2000, max_concurrency: int = 16) -> List[str]:
+    """Synchronous wrapper around batch_generate for scripts and reports"""
+    return asyncio.run(batch_generate(prompts, model, max_tokens, max_concurrency))
+
+
+# Expected-output-length bins with a max_tokens budget per bin. Grouping
+# requests with similar response lengths avoids short answers queueing
+# behind long itinerary-style generations in the same batch.
+OUTPUT_BINS = {"short": 256, "medium": 1024, "long": 2000}
+
+# Keyword heuristics for predicting response length from the prompt
+_SHORT_HINTS = ("price", "cost", "hours", "open", "closed", "where is", "address", "phone", "when")
+_LONG_HINTS = ("itinerary", "plan", "trip", "days", "weekend", "wine trail", "tour", "guide", "compare")
+
+
+def predict_output_bin(prompt: str) -> str:
+    """Predict which output-length bin a prompt belongs to"""
+    lowered = prompt.lower()
+    if any(hint in lowered for hint in _LONG_HINTS):
+        return "long"
+    if any(hint in lowered for hint in _SHORT_HINTS):
+        return "short"
+    return "medium"
+
+
+def bin_prompts(prompts: List[str], predictor=predict_output_bin) -> Dict[str, List[int]]:
+    """Partition prompt indices into output-length bins"""
+    bins: Dict[str, List[int]] = {}
+    for i, prompt in enumerate(prompts):
+        bins.setdefault(predictor(prompt), []).append(i)
+    return bins
+
+
+async def batch_generate_binned(prompts: List[str], model: str = "google/gemini-2.5-flash",
+                                max_concurrency: int = 16, predictor=predict_output_bin) -> List[str]:
+    """Generate completions with multi-bin batching by expected output length.
+
+    Each bin is submitted as its own batch with a bin-appropriate max_tokens
+    cap, so short requests aren't head-of-line blocked by long ones. Results
+    are reassembled in input order.
+    """
+    results: List[Optional[str]] = [None] * len(prompts)
+
+    for bin_name, indices in bin_prompts(prompts, predictor).items():
+        replies = await batch_generate(
+            [prompts[i] for i in indices],
+            model=model,
+            max_tokens=OUTPUT_BINS[bin_name],
+            max_concurrency=max_concurrency
+        )
+        for i, reply in zip(indices, replies):
+            results[i] = reply
+
+    return results
@@ -9,11 +9,21 @@ from typing import Dict, List, Optional
 from supabase_client import SupabaseClient
 
 
+def _sum_costs(sessions: List[Dict]) -> float:
+    """Sum session costs in a vectorized C loop instead of a Python one"""
+    import numpy as np
+    return float(np.fromiter(
+        (session.get("total_cost", 0.0) for session in sessions),
+        dtype=np.float64, count=len(sessions)
+    ).sum())
+
+
 class BudgetManager:
     """Budget management system with Supabase integration"""
     
-    def __init__(self):
-        self.supabase = SupabaseClient()
+    def __init__(self, supabase: Optional[SupabaseClient] = None):
+        # Accept a shared client so callers don't construct one per component
+        self.supabase = supabase or SupabaseClient()
     
     def create_daily_budget(self, limit_amount: float) -> bool:
         """Create a daily budget"""
@@ -30,8 +40,11 @@ class BudgetManager:
     def get_budget_status(self, budget_type: str = "daily") -> Dict:
         """Get budget status and spending information"""
         budget_data = self.supabase.get_budget_data(budget_type)
-        
-        if not budget_data:
+        return self._budget_status(budget_type, budget_data[0] if budget_data else None)
+
+    def _budget_status(self, budget_type: str, budget: Optional[Dict]) -> Dict:
+        """Build a status dict from an already-fetched budget row"""
+        if not budget:
             return {
                 "status": "no_budget",
                 "message": f"No {budget_type} budget set",
@@ -40,8 +53,7 @@ class BudgetManager:
                 "remaining": 0,
                 "percentage_used": 0
             }
-        
-        budget = budget_data[0]
+
         limit_amount = budget["limit_amount"]
         current_spent = budget["current_spent"]
         remaining = limit_amount - current_spent
@@ -119,18 +131,26 @@ class BudgetManager:
     
     def get_spending_summary(self, days: int = 30) -> Dict:
         """Get spending summary for the last N days"""
-        sessions_data = self.supabase.get_analytics_data(days)
-        
-        total_cost = sum(session.get("total_cost", 0) for session in sessions_data)
-        total_sessions = len(sessions_data)
-        
+        # One RPC returns the aggregated totals and both budget rows,
+        # replacing three serial queries
+        dashboard = self.supabase.get_spending_dashboard(days)
+
+        if dashboard is not None:
+            total_cost = dashboard.get("total_spent", 0) or 0
+            total_sessions = dashboard.get("total_sessions", 0)
+            daily_budget = self._budget_status("daily", dashboard.get("daily_budget"))
+            monthly_budget = self._budget_status("monthly", dashboard.get("monthly_budget"))
+        else:
+            # Fallback: separate queries if the function isn't installed
+            sessions_data = self.supabase.get_analytics_data(days)
+            total_cost = _sum_costs(sessions_data)
+            total_sessions = len(sessions_data)
+            daily_budget = self.get_budget_status("daily")
+            monthly_budget = self.get_budget_status("monthly")
+
         # Calculate daily average
         daily_average = total_cost / max(days, 1)
-        
-        # Get budget status
-        daily_budget = self.get_budget_status("daily")
-        monthly_budget = self.get_budget_status("monthly")
-        
+
         return {
             "period_days": days,
             "total_spent": total_cost,
@@ -143,24 +163,37 @@ class BudgetManager:
     
     def check_spending_alerts(self) -> List[Dict]:
         """Check for spending alerts across all budgets"""
-        alerts = []
-        
+        import numpy as np
+
+        # One fetch for all budgets (the old loop re-queried each one), then
+        # percentage and threshold checks run as vectorized array ops
         budgets = self.get_all_budgets()
-        
-        for budget in budgets:
-            budget_type = budget["budget_type"]
-            status = self.get_budget_status(budget_type)
-            
-            if status["status"] in ["exceeded", "warning"]:
-                alerts.append({
-                    "type": "budget_alert",
-                    "budget_type": budget_type,
-                    "status": status["status"],
-                    "message": status["message"],
-                    "percentage_used": status["percentage_used"],
-                    "remaining": status["remaining"]
-                })
-        
+        if not budgets:
+            return []
+
+        limits = np.fromiter((b["limit_amount"] for b in budgets), dtype=np.float64, count=len(budgets))
+        spent = np.fromiter((b["current_spent"] for b in budgets), dtype=np.float64, count=len(budgets))
+        pct = np.divide(spent * 100.0, limits, out=np.zeros_like(spent), where=limits > 0)
+
+        alerts = []
+        for i in np.nonzero(pct >= 80.0)[0]:
+            percentage = float(pct[i])
+            if percentage >= 100:
+                status = "exceeded"
+                message = f"⚠️ Budget exceeded! ({percentage:.1f}% used)"
+            else:
+                status = "warning"
+                message = f"⚠️ Approaching budget limit ({percentage:.1f}% used)"
+
+            alerts.append({
+                "type": "budget_alert",
+                "budget_type": budgets[i]["budget_type"],
+                "status": status,
+                "message": message,
+                "percentage_used": percentage,
+                "remaining": float(limits[i] - spent[i])
+            })
+
         return alerts
     
     def get_cost_projection(self, budget_type: str = "daily", days_ahead: int = 7) -> Dict:
@@ -176,7 +209,7 @@ class BudgetManager:
             }
         
         # Calculate average daily spending
-        total_recent_cost = sum(session.get("total_cost", 0) for session in recent_data)
+        total_recent_cost = _sum_costs(recent_data)
         avg_daily_spending = total_recent_cost / 7
         
         # Project future spending
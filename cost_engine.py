@@ -3,44 +3,194 @@ Cost Calculation Engine for Travel Texas AI Agent
 Handles real-time cost calculations, session tracking, and budget management
 """
 
+import itertools
 import os
-import json
-import uuid
+import orjson
+import queue
+from collections import deque
+import threading
+import time
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional, Tuple
 from supabase_client import SupabaseClient
 
+# Parsed models config shared by every engine method; the file is re-read
+# only when its mtime changes instead of per logged message
+_CONFIG_CACHE = {"mtime": None, "models": {}, "prices": {}}
+
+# Session ids only need process-lifetime uniqueness: a fixed pid+startup
+# prefix plus a counter avoids strftime and uuid4 on every new session
+_SESSION_PREFIX = f"session_{os.getpid()}_{int(time.time())}_"
+_SESSION_COUNTER = itertools.count(1)
+
+
+# Shared default client wrapper: engines created without an explicit
+# client reuse one long-lived connection pool instead of building their own
+_DEFAULT_SUPABASE: Optional[SupabaseClient] = None
+
+
+def _default_supabase() -> SupabaseClient:
+    """Return the lazily created module-wide SupabaseClient"""
+    global _DEFAULT_SUPABASE
+    if _DEFAULT_SUPABASE is None:
+        _DEFAULT_SUPABASE = SupabaseClient()
+    return _DEFAULT_SUPABASE
+
+
+def _compute_message_cost(input_tokens: int, output_tokens: int,
+                          input_rate: float, output_rate: float) -> Tuple[float, float, float]:
+    """Pure arithmetic cost kernel over per-token rates, kept free of dict access"""
+    input_cost = input_tokens * input_rate
+    output_cost = output_tokens * output_rate
+    return input_cost, output_cost, input_cost + output_cost
+
+
+def _get_models() -> Dict:
+    """Return the models section of models_config.json, cached by mtime"""
+    try:
+        mtime = os.stat("models_config.json").st_mtime
+    except OSError:
+        return {}
+
+    if _CONFIG_CACHE["mtime"] != mtime:
+        try:
+            # orjson parses the raw bytes in C, cutting cold-start parse time
+            with open("models_config.json", "rb") as f:
+                _CONFIG_CACHE["models"] = orjson.loads(f.read()).get("models", {})
+            # Flatten pricing into per-token rates once, so the per-message
+            # hot path is one lookup and two multiplies
+            _CONFIG_CACHE["prices"] = {
+                model_id: (
+                    model_info.get("pricing", {}).get("input_tokens_per_million", 0) * 1e-6,
+                    model_info.get("pricing", {}).get("output_tokens_per_million", 0) * 1e-6
+                )
+                for model_id, model_info in _CONFIG_CACHE["models"].items()
+            }
+            _CONFIG_CACHE["mtime"] = mtime
+        except Exception as e:
+            print(f"❌ Error loading models config: {e}")
+            return {}
+
+    return _CONFIG_CACHE["models"]
+
+
+def _get_price_table() -> Dict[str, Tuple[float, float]]:
+    """Return per-token (input, output) rates keyed by model id"""
+    _get_models()  # refresh the cache if the config file changed
+    return _CONFIG_CACHE["prices"]
+
 
 class CostCalculationEngine:
     """Advanced cost calculation engine with database integration"""
-    
-    def __init__(self):
-        self.supabase = SupabaseClient()
+
+    # Fixed attribute set: no per-instance __dict__, and attribute access in
+    # the log_message hot path resolves through C-level slots
+    __slots__ = (
+        "supabase", "current_session_id", "session_data",
+        "_pending_messages", "_last_flush",
+        "_usage_cache", "_comparison_cache",
+        "_write_queue", "_writer"
+    )
+
+    # Write-behind buffer: message rows and session totals reach the
+    # database once per batch instead of per message. The totals are
+    # monotonic and only read on summary/end, so intermediate writes are
+    # wasted I/O; a small batch keeps the persisted state close behind.
+    _FLUSH_EVERY_N = 5
+    _FLUSH_INTERVAL_SECONDS = 2.0
+
+    # In-memory messages keep only a recent tail; the full history lives in
+    # the messages table, so RAM stays constant however long the session runs
+    _RECENT_MESSAGES_MAX = 50
+
+    # How long aggregated usage/comparison results stay fresh; dashboard
+    # reruns within this window reuse them instead of re-querying Supabase
+    _ANALYTICS_TTL_SECONDS = 30.0
+
+    def __init__(self, supabase: Optional[SupabaseClient] = None):
+        # Accept a shared client so callers don't construct one per component
+        self.supabase = supabase or _default_supabase()
         self.current_session_id = None
+        self._pending_messages = []
+        self._last_flush = time.monotonic()
+        # (value, expiry) pairs for the TTL-cached analytics results
+        self._usage_cache = (None, 0.0)
+        self._comparison_cache = (None, 0.0)
+
+        # Database writes run on a background worker so log_message returns
+        # after local dict updates instead of blocking on HTTP
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_worker, daemon=True)
+        self._writer.start()
         self.session_data = {
             "total_cost": 0.0,
             "total_messages": 0,
             "total_input_tokens": 0,
             "total_output_tokens": 0,
-            "messages": []
+            "messages": deque(maxlen=self._RECENT_MESSAGES_MAX)
         }
         
         # Note: Database tables should be created manually using supabase_schema.sql
         # self.supabase.create_tables()
-    
+
+    def _reset_session_data(self):
+        """Zero the session totals in place, reusing the dict and message deque"""
+        session_data = self.session_data
+        session_data["total_cost"] = 0.0
+        session_data["total_messages"] = 0
+        session_data["total_input_tokens"] = 0
+        session_data["total_output_tokens"] = 0
+        session_data["messages"].clear()
+
+    def _write_worker(self):
+        """Drain queued database writes; errors are logged, never raised"""
+        while True:
+            write_fn, args = self._write_queue.get()
+            try:
+                write_fn(*args)
+            except Exception as e:
+                print(f"❌ Error in background database write: {e}")
+            finally:
+                self._write_queue.task_done()
+
+    def _write_flush(self, session_id, rows, total_cost, total_messages,
+                     total_input_tokens, total_output_tokens):
+        """Persist a snapshot of buffered rows and totals (runs on the worker)"""
+        ok = self.supabase.log_and_update_session(
+            session_id, rows, total_cost, total_messages,
+            total_input_tokens, total_output_tokens
+        )
+        if not ok:
+            # Fallback: two requests if the function isn't installed
+            self.supabase.log_messages_bulk(rows)
+            self.supabase.update_session(
+                session_id, total_cost, total_messages,
+                total_input_tokens, total_output_tokens
+            )
+
+    def _flush_messages(self):
+        """Hand the buffered rows and current totals to the background writer"""
+        if self._pending_messages:
+            self._write_queue.put((self._write_flush, (
+                self.current_session_id,
+                self._pending_messages,
+                self.session_data["total_cost"],
+                self.session_data["total_messages"],
+                self.session_data["total_input_tokens"],
+                self.session_data["total_output_tokens"]
+            )))
+            self._pending_messages = []
+        self._last_flush = time.monotonic()
+
     def start_session(self, model_used: str) -> str:
         """Start a new session"""
-        self.current_session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        
+        # Rows carry their own session_id, so flushing leftovers here is safe
+        self._flush_messages()
+        self.current_session_id = f"{_SESSION_PREFIX}{next(_SESSION_COUNTER):08x}"
+
         # Reset session data
-        self.session_data = {
-            "total_cost": 0.0,
-            "total_messages": 0,
-            "total_input_tokens": 0,
-            "total_output_tokens": 0,
-            "messages": []
-        }
-        
+        self._reset_session_data()
+
         # Create session in database
         self.supabase.create_session(self.current_session_id, model_used)
         
@@ -48,26 +198,27 @@ class CostCalculationEngine:
     
     def calculate_message_cost(self, model_id: str, input_tokens: int, output_tokens: int) -> Dict:
         """Calculate cost for a single message"""
-        # Load model pricing from config
+        # Nothing to price (e.g. empty user turns) — skip the config lookup
+        if not input_tokens and not output_tokens:
+            return {
+                "input_cost": 0,
+                "output_cost": 0,
+                "total_cost": 0,
+                "input_tokens": 0,
+                "output_tokens": 0
+            }
+
+        # Load the precomputed per-token rates from the cached config
         try:
-            with open("models_config.json", "r") as f:
-                config = json.load(f)
-                models = config.get("models", {})
-                
-            if model_id not in models:
+            rates = _get_price_table().get(model_id)
+
+            if rates is None:
                 return {"input_cost": 0, "output_cost": 0, "total_cost": 0}
-                
-            model_info = models[model_id]
-            pricing = model_info.get("pricing", {})
-            
-            input_cost_per_million = pricing.get("input_tokens_per_million", 0)
-            output_cost_per_million = pricing.get("output_tokens_per_million", 0)
-            
-            # Calculate costs
-            input_cost = (input_tokens / 1_000_000) * input_cost_per_million
-            output_cost = (output_tokens / 1_000_000) * output_cost_per_million
-            total_cost = input_cost + output_cost
-            
+
+            input_cost, output_cost, total_cost = _compute_message_cost(
+                input_tokens, output_tokens, rates[0], rates[1]
+            )
+
             return {
                 "input_cost": input_cost,
                 "output_cost": output_cost,
@@ -95,33 +246,33 @@ class CostCalculationEngine:
         self.session_data["total_input_tokens"] += input_tokens
         self.session_data["total_output_tokens"] += output_tokens
         
-        # Add message to session
+        # Add message to session; content is omitted here since the full
+        # text is persisted to the messages table anyway
         message_data = {
             "type": message_type,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
             "cost": cost_data["total_cost"],
             "model_used": model_used,
-            "timestamp": datetime.now().isoformat(),
-            "content": content[:100] if content else ""
+            # Epoch float: ISO formatting is deferred to get_session_summary
+            "timestamp": time.time()
         }
         self.session_data["messages"].append(message_data)
         
-        # Log to database
-        self.supabase.log_message(
-            self.current_session_id, message_type, input_tokens, 
-            output_tokens, cost_data["total_cost"], model_used, content
-        )
-        
-        # Update session in database
-        self.supabase.update_session(
-            self.current_session_id,
-            self.session_data["total_cost"],
-            self.session_data["total_messages"],
-            self.session_data["total_input_tokens"],
-            self.session_data["total_output_tokens"]
-        )
-        
+        # Buffer the database row; flushed in bulk on size/time threshold
+        self._pending_messages.append({
+            "session_id": self.current_session_id,
+            "message_type": message_type,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": cost_data["total_cost"],
+            "model_used": model_used,
+            "content": content[:1000] if content else ""  # Limit content length
+        })
+        if (len(self._pending_messages) >= self._FLUSH_EVERY_N
+                or time.monotonic() - self._last_flush > self._FLUSH_INTERVAL_SECONDS):
+            self._flush_messages()
+
         return cost_data
     
     def get_session_summary(self) -> Dict:
@@ -136,9 +287,20 @@ class CostCalculationEngine:
             "total_input_tokens": self.session_data["total_input_tokens"],
             "total_output_tokens": self.session_data["total_output_tokens"],
             "avg_cost_per_message": self.session_data["total_cost"] / max(self.session_data["total_messages"], 1),
-            "messages": self.session_data["messages"]
+            # Format the stored epoch timestamps only here, where they're read
+            "messages": [
+                dict(message, timestamp=datetime.fromtimestamp(message["timestamp"]).isoformat())
+                for message in self.session_data["messages"]
+            ]
         }
     
+    def get_full_message_history(self, session_id: Optional[str] = None) -> List[Dict]:
+        """Fetch the complete persisted message history for a session"""
+        session_id = session_id or self.current_session_id
+        if not session_id:
+            return []
+        return self.supabase.get_messages_for_session(session_id)
+
     def calculate_cost_per_million_tokens(self, model_id: str, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost per million tokens"""
         cost_data = self.calculate_message_cost(model_id, input_tokens, output_tokens)
@@ -151,74 +313,76 @@ class CostCalculationEngine:
     
     def generate_cost_comparison_table(self) -> List[Dict]:
         """Generate cost comparison table with real usage data from Supabase"""
+        cached, expiry = self._comparison_cache
+        if cached is not None and time.monotonic() < expiry:
+            return cached
+
         try:
-            # Load model configurations
-            with open("models_config.json", "r") as f:
-                config = json.load(f)
-                models = config.get("models", {})
-            
-            comparison_data = []
-            
+            import numpy as np
+
+            # Load model configurations from the cached config
+            models = _get_models()
+            available = [
+                (model_id, model_info) for model_id, model_info in models.items()
+                if model_info.get("available", True)
+            ]
+            if not available:
+                return []
+
             # Get real usage data from Supabase
             usage_data = self._get_real_usage_data()
-            
-            for model_id, model_info in models.items():
-                if not model_info.get("available", True):
-                    continue
-                    
-                pricing = model_info.get("pricing", {})
-                input_cost_per_million = pricing.get("input_tokens_per_million", 0)
-                output_cost_per_million = pricing.get("output_tokens_per_million", 0)
-                
-                # Get real usage data for this model
+
+            # Column arrays over the available models; the per-session and
+            # per-million cost math then runs as whole-array operations
+            count = len(available)
+            in_price = np.fromiter(
+                (info.get("pricing", {}).get("input_tokens_per_million", 0) for _, info in available),
+                dtype=np.float64, count=count)
+            out_price = np.fromiter(
+                (info.get("pricing", {}).get("output_tokens_per_million", 0) for _, info in available),
+                dtype=np.float64, count=count)
+            msgs_per_session = np.fromiter(
+                (usage_data.get(model_id, {}).get("avg_messages_per_session", 0) for model_id, _ in available),
+                dtype=np.float64, count=count)
+            in_per_msg = np.fromiter(
+                (usage_data.get(model_id, {}).get("avg_input_tokens_per_message", 0) for model_id, _ in available),
+                dtype=np.float64, count=count)
+            out_per_msg = np.fromiter(
+                (usage_data.get(model_id, {}).get("avg_output_tokens_per_message", 0) for model_id, _ in available),
+                dtype=np.float64, count=count)
+
+            # Models missing any usage component show 0/nil values
+            has_data = (msgs_per_session > 0) & (in_per_msg > 0) & (out_per_msg > 0)
+            total_input_tokens = np.where(has_data, msgs_per_session * in_per_msg, 0.0)
+            total_output_tokens = np.where(has_data, msgs_per_session * out_per_msg, 0.0)
+            total_cost_per_session = (total_input_tokens * in_price + total_output_tokens * out_price) / 1_000_000
+            total_tokens = total_input_tokens + total_output_tokens
+            cost_per_million = np.divide(
+                total_cost_per_session * 1_000_000, total_tokens,
+                out=np.zeros_like(total_tokens), where=total_tokens > 0)
+
+            comparison_data = []
+            # Cheapest first: argsort replaces the post-hoc list sort
+            for i in np.argsort(cost_per_million):
+                model_id, model_info = available[i]
                 model_usage = usage_data.get(model_id, {})
-                
-                # Use real data if available, otherwise use 0/nil
-                messages_per_session = model_usage.get("avg_messages_per_session", 0)
-                input_tokens_per_message = model_usage.get("avg_input_tokens_per_message", 0)
-                output_tokens_per_message = model_usage.get("avg_output_tokens_per_message", 0)
-                
-                # Calculate costs (handle 0 values)
-                if messages_per_session == 0 or input_tokens_per_message == 0 or output_tokens_per_message == 0:
-                    # No real data available - show 0/nil values
-                    total_input_tokens = 0
-                    total_output_tokens = 0
-                    input_cost = 0
-                    output_cost = 0
-                    total_cost_per_session = 0
-                    total_tokens = 0
-                    cost_per_million = 0
-                else:
-                    # Real data available - calculate normally
-                    total_input_tokens = messages_per_session * input_tokens_per_message
-                    total_output_tokens = messages_per_session * output_tokens_per_message
-                    
-                    input_cost = (total_input_tokens / 1_000_000) * input_cost_per_million
-                    output_cost = (total_output_tokens / 1_000_000) * output_cost_per_million
-                    total_cost_per_session = input_cost + output_cost
-                    
-                    total_tokens = total_input_tokens + total_output_tokens
-                    cost_per_million = (total_cost_per_session / total_tokens) * 1_000_000
-                
                 comparison_data.append({
                     "model_id": model_id,
                     "model_name": model_info["name"],
                     "provider": model_info.get("provider", "Unknown"),
                     "emoji": model_info["emoji"],
-                    "input_cost_per_million": input_cost_per_million,
-                    "output_cost_per_million": output_cost_per_million,
-                    "messages_per_session": messages_per_session,
-                    "input_tokens_per_message": input_tokens_per_message,
-                    "output_tokens_per_message": output_tokens_per_message,
-                    "total_cost_per_session": round(total_cost_per_session, 6),
-                    "cost_per_million": round(cost_per_million, 2),
+                    "input_cost_per_million": float(in_price[i]),
+                    "output_cost_per_million": float(out_price[i]),
+                    "messages_per_session": float(msgs_per_session[i]),
+                    "input_tokens_per_message": float(in_per_msg[i]),
+                    "output_tokens_per_message": float(out_per_msg[i]),
+                    "total_cost_per_session": round(float(total_cost_per_session[i]), 6),
+                    "cost_per_million": round(float(cost_per_million[i]), 2),
                     "total_sessions": model_usage.get("total_sessions", 0),
                     "total_cost": model_usage.get("total_cost", 0)
                 })
-            
-            # Sort by cost per million (cheapest first)
-            comparison_data.sort(key=lambda x: x["cost_per_million"])
-            
+
+            self._comparison_cache = (comparison_data, time.monotonic() + self._ANALYTICS_TTL_SECONDS)
             return comparison_data
             
         except Exception as e:
@@ -227,39 +391,35 @@ class CostCalculationEngine:
     
     def _get_real_usage_data(self) -> Dict:
         """Get real usage data from Supabase"""
+        cached, expiry = self._usage_cache
+        if cached is not None and time.monotonic() < expiry:
+            return cached
+
         try:
             if not self.supabase:
                 return {}
             
-            # Get analytics data from Supabase
-            analytics_data = self.supabase.get_analytics_data()
-            
-            if not analytics_data:
+            # One row per model, grouped in the database (get_model_aggregates
+            # falls back to client-side grouping if the view is unavailable)
+            rows = self.get_model_aggregates(30)
+
+            if not rows:
                 return {}
-            
-            # Process the data to get averages per model
+
             model_stats = {}
-            
-            for record in analytics_data:
-                model_id = record.get("model_used")  # Changed from "model_id" to "model_used"
+
+            for row in rows:
+                model_id = row.get("model_used")
                 if not model_id:
                     continue
-                
-                if model_id not in model_stats:
-                    model_stats[model_id] = {
-                        "total_sessions": 0,
-                        "total_messages": 0,
-                        "total_input_tokens": 0,
-                        "total_output_tokens": 0,
-                        "total_cost": 0
-                    }
-                
-                # Use actual field names from Supabase data
-                model_stats[model_id]["total_sessions"] += 1  # Each record is one session
-                model_stats[model_id]["total_messages"] += record.get("total_messages", 0)
-                model_stats[model_id]["total_input_tokens"] += record.get("total_input_tokens", 0)
-                model_stats[model_id]["total_output_tokens"] += record.get("total_output_tokens", 0)
-                model_stats[model_id]["total_cost"] += record.get("total_cost", 0)
+
+                model_stats[model_id] = {
+                    "total_sessions": row.get("sessions", 0),
+                    "total_messages": row.get("total_messages", 0),
+                    "total_input_tokens": row.get("total_input_tokens", 0),
+                    "total_output_tokens": row.get("total_output_tokens", 0),
+                    "total_cost": row.get("total_cost", 0)
+                }
             
             # Calculate averages
             for model_id, stats in model_stats.items():
@@ -275,7 +435,8 @@ class CostCalculationEngine:
             print(f"📊 Real usage data processed: {len(model_stats)} models")
             for model_id, stats in model_stats.items():
                 print(f"   {model_id}: {stats['total_sessions']} sessions, {stats['total_messages']} messages")
-            
+
+            self._usage_cache = (model_stats, time.monotonic() + self._ANALYTICS_TTL_SECONDS)
             return model_stats
             
         except Exception as e:
@@ -287,11 +448,14 @@ class CostCalculationEngine:
         sessions_data = self.supabase.get_analytics_data(days)
         
         total_sessions = len(sessions_data)
-        total_cost = sum(session.get("total_cost", 0) for session in sessions_data)
-        total_messages = sum(session.get("total_messages", 0) for session in sessions_data)
-        total_input_tokens = sum(session.get("total_input_tokens", 0) for session in sessions_data)
-        total_output_tokens = sum(session.get("total_output_tokens", 0) for session in sessions_data)
-        
+        # Accumulate all four totals in one pass over the rows
+        total_cost = total_messages = total_input_tokens = total_output_tokens = 0
+        for session in sessions_data:
+            total_cost += session.get("total_cost", 0)
+            total_messages += session.get("total_messages", 0)
+            total_input_tokens += session.get("total_input_tokens", 0)
+            total_output_tokens += session.get("total_output_tokens", 0)
+
         return {
             "period_days": days,
             "total_sessions": total_sessions,
@@ -304,6 +468,56 @@ class CostCalculationEngine:
             "sessions": sessions_data
         }
     
+    def get_daily_aggregates(self, days: int = 30) -> List[Dict]:
+        """Get per-day cost/session aggregates, pre-bucketed in the database"""
+        rows = self.supabase.get_daily_aggregates(days)
+        if rows:
+            return rows
+
+        # Fallback: bucket client-side if the view is unavailable
+        daily = {}
+        for session in self.supabase.get_analytics_data(days):
+            day = session.get("start_time", "")[:10]
+            bucket = daily.setdefault(day, {"date": day, "cost": 0.0, "sessions": 0})
+            bucket["cost"] += session.get("total_cost", 0)
+            bucket["sessions"] += 1
+
+        return [daily[day] for day in sorted(daily)]
+
+    def get_model_aggregates(self, days: int = 30) -> List[Dict]:
+        """Get per-model usage aggregates, pre-grouped in the database"""
+        stats = {}
+
+        rows = self.supabase.get_model_aggregates(days)
+        if rows:
+            # View rows are per (model, day); fold the days together
+            for row in rows:
+                model = row.get("model_used", "Unknown")
+                bucket = stats.setdefault(model, {
+                    "model_used": model, "sessions": 0, "total_messages": 0,
+                    "total_input_tokens": 0, "total_output_tokens": 0, "total_cost": 0.0
+                })
+                bucket["sessions"] += row.get("sessions", 0)
+                bucket["total_messages"] += row.get("total_messages", 0)
+                bucket["total_input_tokens"] += row.get("total_input_tokens", 0)
+                bucket["total_output_tokens"] += row.get("total_output_tokens", 0)
+                bucket["total_cost"] += row.get("total_cost", 0)
+        else:
+            # Fallback: group client-side if the view is unavailable
+            for session in self.supabase.get_analytics_data(days):
+                model = session.get("model_used", "Unknown")
+                bucket = stats.setdefault(model, {
+                    "model_used": model, "sessions": 0, "total_messages": 0,
+                    "total_input_tokens": 0, "total_output_tokens": 0, "total_cost": 0.0
+                })
+                bucket["sessions"] += 1
+                bucket["total_messages"] += session.get("total_messages", 0)
+                bucket["total_input_tokens"] += session.get("total_input_tokens", 0)
+                bucket["total_output_tokens"] += session.get("total_output_tokens", 0)
+                bucket["total_cost"] += session.get("total_cost", 0)
+
+        return list(stats.values())
+
     def check_budget_limits(self, budget_type: str = "daily") -> Dict:
         """Check if spending is within budget limits"""
         budget_data = self.supabase.get_budget_data(budget_type)
@@ -345,23 +559,28 @@ class CostCalculationEngine:
     def end_session(self):
         """End current session"""
         if self.current_session_id:
-            # Final update to database
-            self.supabase.update_session(
-                self.current_session_id,
-                self.session_data["total_cost"],
-                self.session_data["total_messages"],
-                self.session_data["total_input_tokens"],
-                self.session_data["total_output_tokens"]
-            )
-            
+            if self._pending_messages:
+                # Flushing also writes the final session totals
+                self._flush_messages()
+            else:
+                # Nothing buffered — just stamp the final totals and end time
+                self.supabase.update_session(
+                    self.current_session_id,
+                    self.session_data["total_cost"],
+                    self.session_data["total_messages"],
+                    self.session_data["total_input_tokens"],
+                    self.session_data["total_output_tokens"]
+                )
+
+            # Wait for queued writes so the session is fully persisted
+            self._write_queue.join()
+
             # Update budget spending
             self.supabase.update_budget_spending("daily", self.session_data["total_cost"])
-            
+
+            # The finished session changes the aggregates; drop stale results
+            self._usage_cache = (None, 0.0)
+            self._comparison_cache = (None, 0.0)
+
             self.current_session_id = None
-            self.session_data = {
-                "total_cost": 0.0,
-                "total_messages": 0,
-                "total_input_tokens": 0,
-                "total_output_tokens": 0,
-                "messages": []
-            }
+            self._reset_session_data()
@@ -3,62 +3,238 @@ Frontend components for Travel Texas AI Agent
 Handles Streamlit UI, user interactions, and display logic
 """
 
+import functools
+import queue
 import streamlit as st
+import threading
 import time
+from pathlib import Path
 from backend import TravelTexasBackend
-from agent_prompt_condensed import TEXAS_TOURISM_AGENT_PROMPT_CONDENSED as TEXAS_TOURISM_AGENT_PROMPT
+from agent_prompt import get_agent_prompt
+
+TEXAS_TOURISM_AGENT_PROMPT = get_agent_prompt()
+
+# Single system message reused for every API call (read-only downstream)
+_SYSTEM_MESSAGE = {"role": "system", "content": TEXAS_TOURISM_AGENT_PROMPT}
+
+# The system prompt never changes, so its token count is computed once per
+# process; module scope survives the per-rerun frontend re-instantiation
+_SYSTEM_PROMPT_TOKENS = None
+
+
+def _system_prompt_tokens(backend) -> int:
+    """Return the cached token count of the static system prompt"""
+    global _SYSTEM_PROMPT_TOKENS
+    if _SYSTEM_PROMPT_TOKENS is None:
+        _SYSTEM_PROMPT_TOKENS = backend.count_tokens(TEXAS_TOURISM_AGENT_PROMPT)
+    return _SYSTEM_PROMPT_TOKENS
+
+
+# Lazy plotly singleton: the import (~400ms cold) is paid on the first
+# Analytics render with data, never on the chat path
+_px = None
+
+
+def _get_px():
+    """Import plotly.express on first use and reuse the module object"""
+    global _px
+    if _px is None:
+        import plotly.express as px
+        _px = px
+    return _px
+
+
+@functools.lru_cache(maxsize=4)
+def _model_option_index(option_items):
+    """Precompute selectbox labels, keys and key->index for a model option set"""
+    labels = tuple(label for label, _ in option_items)
+    keys = tuple(key for _, key in option_items)
+    return labels, keys, {key: i for i, key in enumerate(keys)}
+
+
+@st.cache_resource
+def _get_backend():
+    """Build the backend once per process so its HTTP client, tokenizer and
+    Supabase connections survive Streamlit's per-interaction reruns"""
+    return TravelTexasBackend()
+
+
+@st.cache_resource
+def _get_analytics_dashboard():
+    """Build the analytics dashboard (and its Supabase-backed engine) once per process"""
+    from analytics_dashboard import AnalyticsDashboard
+    return AnalyticsDashboard()
+
+
+# Immutable session-state defaults applied in one setdefault pass; the
+# mutable chat_history/token_usage entries are built fresh per session below
+_SESSION_DEFAULTS = {
+    'selected_model': "google/gemini-2.5-flash",
+    'is_processing': False,
+    'cost_session_started': False,
+    'system_prompt_counted': False,
+    'force_sidebar_refresh': False,
+    'sample_prompt': None,
+}
+
+# Static promo block under the banner; nothing in it depends on runtime
+# state, so it is built once here and the markdown renderer sees
+# byte-identical input every rerun
+_AGENT_INFO_HTML = """
+<div style="
+    text-align: center;
+    margin: 15px 0;
+    padding: 12px;
+    background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
+    border-radius: 8px;
+    border-left: 3px solid #0066cc;
+    max-width: 100%;
+    box-sizing: border-box;
+">
+    <p style="
+        margin: 0 0 8px 0;
+        font-size: clamp(14px, 4vw, 16px);
+        color: #495057;
+        font-style: italic;
+        line-height: 1.4;
+    ">
+        🌟 "Everything's bigger in Texas" - and so are the adventures waiting for you! 🌟
+    </p>
+    <p style="
+        margin: 0;
+        font-size: clamp(12px, 3.5vw, 14px);
+        color: #6c757d;
+        line-height: 1.3;
+    ">
+        From the bustling streets of Dallas to the serene landscapes of Big Bend,
+        your perfect Texas experience awaits...
+    </p>
+    <a href="https://www.traveltexas.com" target="_blank" style="
+        display: inline-block;
+        margin-top: 8px;
+        font-weight: bold;
+        font-size: clamp(16px, 4.5vw, 18px);
+        color: #0066cc;
+        text-decoration: underline;
+        transition: color 0.3s ease;
+        padding: 4px 8px;
+        border-radius: 4px;
+    ">Discover Texas!</a>
+</div>
+"""
+
+# Styling used when styles.css is missing
+_FALLBACK_CSS = """
+/* ChatGPT-like styling */
+.stChatMessage {
+    margin-bottom: 1rem;
+    animation: fadeIn 0.3s ease-in;
+}
+
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(10px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+
+/* Keep input at bottom */
+.stChatInput {
+    position: sticky;
+    bottom: 0;
+    background: white;
+    z-index: 100;
+    margin-top: 2rem;
+}
+
+/* Smooth scrolling */
+.main .block-container {
+    padding-bottom: 6rem;
+}
+"""
+
+
+@st.cache_resource
+def _css_block() -> str:
+    """Read styles.css once per process and wrap it in a <style> tag"""
+    try:
+        css_content = Path('styles.css').read_text()
+    except FileNotFoundError:
+        css_content = _FALLBACK_CSS
+    return f"<style>\n{css_content}\n</style>"
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cost_comparison_rows(_backend):
+    """Fetch the cost comparison table at most once a minute across reruns"""
+    return _backend.get_cost_comparison_table()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cost_comparison_figure_dict(df):
+    """Build the comparison bar chart once a minute; cached as a plain dict
+    since Plotly Figure objects don't pickle reliably across versions"""
+    px = _get_px()
+    fig = px.bar(df, x='Model', y='Cost_per_Mil',
+                 title='Cost Per Mil by Model (Live Data)',
+                 color='Cost_per_Mil',
+                 color_continuous_scale='RdYlGn_r')
+
+    # Make axis labels bold
+    fig.update_layout(
+        xaxis_title_font=dict(size=14, family="Arial", color="black"),
+        yaxis_title_font=dict(size=14, family="Arial", color="black")
+    )
+    return fig.to_dict()
+
+
+@st.cache_resource
+def _load_image_bytes(path: str) -> bytes:
+    """Read a static image once; the bytes are reused across reruns and sessions"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@st.cache_resource
+def _fetch_image_bytes(url: str) -> bytes:
+    """Download a remote image once per process instead of per rerun"""
+    import httpx
+    # Raise on 4xx/5xx so an error page is never cached as the image;
+    # st.cache_resource only stores successful results
+    response = httpx.get(url, timeout=5.0, follow_redirects=True)
+    response.raise_for_status()
+    return response.content
 
 
 class TravelTexasFrontend:
     """Frontend service for Travel Texas AI Agent"""
     
     def __init__(self):
-        self._backend = None
+        # One process-wide backend: reruns re-create the frontend but keep
+        # reusing the same HTTP pool, caches and cost engine
+        self.backend = _get_backend()
         self.init_session_state()
-    
-    @property
-    def backend(self):
-        """Lazy initialization of backend"""
-        if self._backend is None:
-            self._backend = TravelTexasBackend()
-        return self._backend
 
     def init_session_state(self):
         """Initialize Streamlit session state"""
-        if 'chat_history' not in st.session_state:
+        session_state = st.session_state
+
+        if 'chat_history' not in session_state:
             # Use a simple welcome message to avoid backend initialization
             welcome_msg = {
-                "role": "assistant", 
+                "role": "assistant",
                 "content": "Howdy! Welcome to Travel Texas! I'm here to help you plan the perfect Texas adventure. What kind of experience are you looking for?"
             }
-            st.session_state.chat_history = [welcome_msg]
-
-        if 'token_usage' not in st.session_state:
-            st.session_state.token_usage = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+            session_state.chat_history = [welcome_msg]
 
-        if 'selected_model' not in st.session_state:
-            # Use default model without backend initialization
-            st.session_state.selected_model = "google/gemini-2.5-flash"
-        
-        if 'is_processing' not in st.session_state:
-            st.session_state.is_processing = False
-
-        if 'cost_session_started' not in st.session_state:
-            st.session_state.cost_session_started = False
-
-        if 'system_prompt_counted' not in st.session_state:
-            st.session_state.system_prompt_counted = False
+        if 'token_usage' not in session_state:
+            session_state.token_usage = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
 
-        if 'force_sidebar_refresh' not in st.session_state:
-            st.session_state.force_sidebar_refresh = False
-
-        if 'sample_prompt' not in st.session_state:
-            st.session_state.sample_prompt = None
+        for key, value in _SESSION_DEFAULTS.items():
+            session_state.setdefault(key, value)
 
     def render_sidebar(self):
         """Render the sidebar with controls"""
         with st.sidebar:
-            st.image("Texas.webp", width=450)
+            st.image(_load_image_bytes("Texas.webp"), width=450)
             st.title("Travel Texas AI Agent")
             
 
@@ -67,14 +243,14 @@ class TravelTexasFrontend:
             # Model selection dropdown
             st.subheader(" Model Selection")
 
-            # Create options list with emoji and pricing
-            model_options = {}
+            # Create options in one pass; the catalogue itself is a plain
+            # attribute read on the backend, so no extra cache layer needed
             available_models = self.backend.get_available_models()
-            
-            for key, info in available_models.items():
-                if info.get('available', True):
-                    label = f"{info['name']}"
-                    model_options[label] = key
+            model_options = {
+                info['name']: key
+                for key, info in available_models.items()
+                if info.get('available', True)
+            }
 
             # Handle case where selected model might not be available
             current_selection = st.session_state.selected_model
@@ -82,10 +258,12 @@ class TravelTexasFrontend:
                 current_selection = self.backend.default_model
                 st.session_state.selected_model = current_selection
 
+            # Cached labels/keys/index triple makes the selectbox setup O(1)
+            labels, keys, key_to_idx = _model_option_index(tuple(model_options.items()))
             selected_label = st.selectbox(
                 "Choose AI Model:",
-                options=list(model_options.keys()),
-                index=list(model_options.values()).index(current_selection),
+                options=labels,
+                index=key_to_idx[current_selection],
                 help="Select your preferred AI model"
             )
 
@@ -93,54 +271,66 @@ class TravelTexasFrontend:
             if new_selection != st.session_state.selected_model:
                 st.session_state.selected_model = new_selection
 
-            # Display current model info with pricing
-            current_model = available_models[st.session_state.selected_model]
-            pricing = current_model.get('pricing', {})
-            input_cost = pricing.get('input_tokens_per_million', 0)
-            output_cost = pricing.get('output_tokens_per_million', 0)
-            
             st.markdown("---")
 
             # Token usage summary with real costs
-            st.subheader("📊 Usage & Costs")
-            usage = st.session_state.token_usage
-            
-            # Calculate real costs for current model
-            if usage['input_tokens'] > 0 or usage['output_tokens'] > 0:
-                cost_data = self.backend.calculate_cost(
-                    st.session_state.selected_model,
-                    usage['input_tokens'],
-                    usage['output_tokens']
-                )
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Input Tokens", f"{usage['input_tokens']:,}")
-                    st.metric("Output Tokens", f"{usage['output_tokens']:,}")
-                with col2:
-                    st.metric("Total Tokens", f"{usage['total_tokens']:,}")
-                    st.metric("Total Cost", f"${cost_data['total_cost']:.4f}")
-                
-                # Cost breakdown
-                st.caption(f"💡 Input: ${cost_data['input_cost']:.4f} | Output: ${cost_data['output_cost']:.4f}")
-            else:
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Input Tokens", "0")
-                    st.metric("Output Tokens", "0")
-                with col2:
-                    st.metric("Total Tokens", "0")
-                    st.metric("Total Cost", "$0.0000")
+            self._render_usage_metrics()
 
             if st.button("🗑️ Clear Chat"):
                 st.session_state.chat_history = [self.backend.get_welcome_message()]
                 st.session_state.token_usage = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
                 # End current session
                 self.backend.end_cost_tracking_session()
+                # The finished session changes the comparison data
+                _cost_comparison_rows.clear()
                 st.success("Chat cleared!")
-        
+
             st.markdown("---")
 
+    @st.fragment
+    def _render_usage_metrics(self):
+        """Usage & cost metrics in their own fragment, so refreshing them
+        re-runs only this block rather than the whole script"""
+        st.subheader("📊 Usage & Costs")
+        usage = st.session_state.token_usage
+
+        # Fast path: the common fresh-session render needs no cost
+        # calculation or number formatting at all
+        if not usage['input_tokens'] and not usage['output_tokens']:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Input Tokens", "0")
+                st.metric("Output Tokens", "0")
+            with col2:
+                st.metric("Total Tokens", "0")
+                st.metric("Total Cost", "$0.0000")
+            return
+
+        cost_data = self.backend.calculate_cost(
+            st.session_state.selected_model,
+            usage['input_tokens'],
+            usage['output_tokens'],
+            usage.get('cached_tokens', 0)
+        )
+
+        # Format every display string once, then hand off to the widgets
+        input_str = f"{usage['input_tokens']:,}"
+        output_str = f"{usage['output_tokens']:,}"
+        total_str = f"{usage['total_tokens']:,}"
+        cost_str = f"${cost_data['total_cost']:.4f}"
+        breakdown_str = f"💡 Input: ${cost_data['input_cost']:.4f} | Output: ${cost_data['output_cost']:.4f}"
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Input Tokens", input_str)
+            st.metric("Output Tokens", output_str)
+        with col2:
+            st.metric("Total Tokens", total_str)
+            st.metric("Total Cost", cost_str)
+
+        # Cost breakdown
+        st.caption(breakdown_str)
+
     def render_header(self, model_config):
         """Render the main header section"""
         st.title(f"{model_config['emoji']} Welcome to Travel Texas!")
@@ -157,57 +347,21 @@ class TravelTexasFrontend:
             # Banner Image - Replace with your local JPG image
             try:
                 # Try to load local banner image first
-                st.image("dallas_banner.jpg", width=700)
+                st.image(_load_image_bytes("dallas_banner.jpg"), width=700)
             except:
                 # Fallback to online image if local file doesn't exist
-                st.image("https://www.traveltexas.com/sites/default/files/texas-banner-hero.jpg", 
-                        width=700)
+                banner_url = "https://www.traveltexas.com/sites/default/files/texas-banner-hero.jpg"
+                try:
+                    st.image(_fetch_image_bytes(banner_url), width=700)
+                except:
+                    # Download failed — hand the URL to Streamlit so the
+                    # page still renders, as the baseline did
+                    st.image(banner_url, width=700)
             
             # Creative text with Discover Texas link - Mobile Compatible
-            st.markdown("""
-            <div style="
-                text-align: center; 
-                margin: 15px 0; 
-                padding: 12px; 
-                background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%); 
-                border-radius: 8px; 
-                border-left: 3px solid #0066cc;
-                max-width: 100%;
-                box-sizing: border-box;
-            ">
-                <p style="
-                    margin: 0 0 8px 0; 
-                    font-size: clamp(14px, 4vw, 16px); 
-                    color: #495057; 
-                    font-style: italic;
-                    line-height: 1.4;
-                ">
-                    🌟 "Everything's bigger in Texas" - and so are the adventures waiting for you! 🌟
-                </p>
-                <p style="
-                    margin: 0; 
-                    font-size: clamp(12px, 3.5vw, 14px); 
-                    color: #6c757d;
-                    line-height: 1.3;
-                ">
-                    From the bustling streets of Dallas to the serene landscapes of Big Bend, 
-                    your perfect Texas experience awaits...
-                </p>
-                <a href="https://www.traveltexas.com" target="_blank" style="
-                    display: inline-block;
-                    margin-top: 8px;
-                    font-weight: bold;
-                    font-size: clamp(16px, 4.5vw, 18px);
-                    color: #0066cc;
-                    text-decoration: underline;
-                    transition: color 0.3s ease;
-                    padding: 4px 8px;
-                    border-radius: 4px;
-                ">Discover Texas!</a>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            
+            st.markdown(_AGENT_INFO_HTML, unsafe_allow_html=True)
+
+
             st.markdown("</div>", unsafe_allow_html=True)
 
             st.markdown("---")
@@ -217,16 +371,34 @@ class TravelTexasFrontend:
         chat_container = st.container()
         
         with chat_container:
-            # Display chat history with better styling
-            for i, message in enumerate(st.session_state.chat_history):
-                with st.chat_message(message["role"]):
-                    if (message["role"] == "assistant" and 
-                        i == len(st.session_state.chat_history) - 1 and 
-                        message["content"] == "" and
-                        st.session_state.is_processing):
-                        self.stream_response_in_place(message, i)
+            # Streamlit rebuilds the page per run, so every bubble must be
+            # replayed; consecutive same-role messages share one chat_message
+            # container to cut widget allocations, and the live-streaming
+            # tail (if any) is rendered separately after the replay
+            history = st.session_state.chat_history
+            last_index = len(history) - 1
+            streaming = (st.session_state.is_processing and
+                         last_index >= 0 and
+                         history[last_index]["role"] == "assistant" and
+                         history[last_index]["content"] == "")
+            replay_end = last_index if streaming else last_index + 1
+
+            i = 0
+            while i < replay_end:
+                role = history[i]["role"]
+                j = i + 1
+                while j < replay_end and history[j]["role"] == role:
+                    j += 1
+                with st.chat_message(role):
+                    if j - i == 1:
+                        st.write(history[i]["content"])
                     else:
-                        st.write(message["content"])
+                        st.write("\n\n".join(m["content"] for m in history[i:j]))
+                i = j
+
+            if streaming:
+                with st.chat_message("assistant"):
+                    self.stream_response_in_place(history[last_index], last_index)
 
     def handle_user_input(self, model_config):
         """Handle user input and generate AI response"""
@@ -242,20 +414,19 @@ class TravelTexasFrontend:
             st.markdown("**💡 Try these sample prompts:**")
             col1, col2, col3 = st.columns(3)
             
+            # No st.rerun() here: the click itself already reruns the script,
+            # and the sample prompt is picked up further down this same run
             with col1:
                 if st.button("🏞️ Best outdoor adventures in Texas", key="sample1", use_container_width=True):
                     st.session_state.sample_prompt = "What are the best outdoor adventures and activities I can do in Texas?"
-                    st.rerun()
-            
+
             with col2:
                 if st.button("🍖 Must-try Texas BBQ spots", key="sample2", use_container_width=True):
                     st.session_state.sample_prompt = "Where can I find the best BBQ and authentic Texas food experiences?"
-                    st.rerun()
-            
+
             with col3:
                 if st.button("🎵 Austin music and nightlife", key="sample3", use_container_width=True):
                     st.session_state.sample_prompt = "Tell me about Austin's music scene and the best places for nightlife in Texas"
-                    st.rerun()
 
         if hasattr(st.session_state, 'sample_prompt') and st.session_state.sample_prompt:
             prompt = st.session_state.sample_prompt
@@ -286,38 +457,110 @@ class TravelTexasFrontend:
 
         # Get the user's last message
         user_message = st.session_state.chat_history[-2]["content"]
-        
-        # Log user message for cost tracking
-        self.backend.log_user_message(user_message, st.session_state.selected_model)
-
-        # Prepare messages for API
-        messages = [
-            {"role": "system", "content": TEXAS_TOURISM_AGENT_PROMPT},
-            *st.session_state.chat_history[:-1]  # Exclude the empty assistant message
-        ]
+
+        # Prepare messages for API, trimming old turns to the token budget;
+        # trim_history builds the final payload so no intermediate
+        # [system, *history] list is allocated here
+        messages = self.backend.trim_history(
+            st.session_state.chat_history[:-1],  # Exclude the empty assistant message
+            system=_SYSTEM_MESSAGE
+        )
         
         def response_generator():
-            full_response = ""
+            # Chunks collect in a list and are joined once at the end,
+            # avoiding repeated string reallocation on long responses
+            response_parts = []
             api_usage_data = None
-            
+
+            # Coalesce tiny SSE deltas before handing them to st.write_stream:
+            # each yield triggers a frontend re-render of the growing message,
+            # so batching by size/time cuts render traffic ~10x
+            pending = []
+            pending_chars = 0
+            last_flush = time.monotonic()
+
+            # Each SSE delta is roughly one token, so counting them during
+            # the stream estimates completion tokens for free
+            output_delta_count = 0
+
+            # Set once this generator stops consuming — normally or because
+            # st.write_stream closed it mid-response (rerun, session end).
+            # The pump thread checks it so an abandoned stream drains out
+            # instead of blocking forever on a full queue
+            consumer_gone = threading.Event()
+
             try:
                 model_config = self.backend.get_model_config(st.session_state.selected_model)
                 api_stream = self.backend.call_openrouter_api_streaming(messages, model_config)
-                
-                for chunk in api_stream:
+
+                # Pump the SSE stream on a worker thread so network reads
+                # overlap rendering; the bounded queue applies backpressure
+                # if tokens arrive faster than the UI can draw them
+                chunk_queue = queue.Queue(maxsize=64)
+
+                def _pump():
+                    try:
+                        for chunk in api_stream:
+                            while not consumer_gone.is_set():
+                                try:
+                                    chunk_queue.put(chunk, timeout=0.25)
+                                    break
+                                except queue.Full:
+                                    continue
+                            else:
+                                return
+                    finally:
+                        # Closing the generator exits its httpx stream
+                        # context, releasing the pooled connection even
+                        # when the response was abandoned mid-stream
+                        api_stream.close()
+                        while not consumer_gone.is_set():
+                            try:
+                                chunk_queue.put(None, timeout=0.25)  # end-of-stream marker
+                                break
+                            except queue.Full:
+                                continue
+
+                threading.Thread(target=_pump, daemon=True).start()
+
+                while (chunk := chunk_queue.get()) is not None:
                     if isinstance(chunk, str) and not chunk.startswith("API Error") and not chunk.startswith("Error"):  # Content chunk
-                        full_response += chunk
-                        yield chunk
+                        response_parts.append(chunk)
+                        output_delta_count += 1
+                        pending.append(chunk)
+                        pending_chars += len(chunk)
+                        now = time.monotonic()
+                        if pending_chars >= 48 or now - last_flush >= 0.05:
+                            yield "".join(pending)
+                            pending.clear()
+                            pending_chars = 0
+                            last_flush = now
                     elif isinstance(chunk, str):  # Error message
                         yield chunk
-                
+
+                if pending:
+                    yield "".join(pending)
+
+                full_response = "".join(response_parts)
                 st.session_state.chat_history[message_index]["content"] = full_response
-                
-                # Log assistant message for cost tracking
-                self.backend.log_assistant_message(full_response, st.session_state.selected_model)
 
                 # Get token usage data from backend
                 api_usage_data = self.backend.get_last_token_usage()
+
+                # Turns replayed from the response cache never hit the API,
+                # so nothing was billed: skip cost logging and leave the
+                # usage totals untouched rather than charging full price
+                if self.backend.was_last_reply_cached():
+                    return
+
+                # Logging happens after the stream so cache replays can be
+                # excluded; both messages reuse the exact API counts where
+                # available instead of re-tokenizing
+                self.backend.log_user_message(user_message, st.session_state.selected_model)
+                self.backend.log_assistant_message(
+                    full_response, st.session_state.selected_model,
+                    token_count=(api_usage_data or {}).get('completion_tokens')
+                )
                 if api_usage_data and api_usage_data.get('prompt_tokens', 0) > 0:
                     # Use actual API usage data
                     if not st.session_state.system_prompt_counted:
@@ -330,20 +573,30 @@ class TravelTexasFrontend:
                     
                     st.session_state.token_usage['output_tokens'] = api_usage_data['completion_tokens']
                     st.session_state.token_usage['total_tokens'] = api_usage_data['total_tokens']
+
+                    # Provider-cached prompt tokens are billed at a discount
+                    details = api_usage_data.get('prompt_tokens_details') or {}
+                    st.session_state.token_usage['cached_tokens'] = details.get('cached_tokens', 0)
                 else:
-                    # Fallback to estimation if API doesn't return usage
-                    user_input_tokens = self.backend.count_tokens(user_message)
-                    
+                    # Fallback to estimation if API doesn't return usage:
+                    # the delta count gathered during streaming stands in for
+                    # completion tokens, so only the user message is tokenized;
+                    # without deltas both texts go through one batch call
+                    if output_delta_count:
+                        user_input_tokens = self.backend.count_tokens(user_message)
+                        estimated_output_tokens = output_delta_count
+                    else:
+                        user_input_tokens, estimated_output_tokens = (
+                            self.backend.count_tokens_batch([user_message, full_response])
+                        )
+
                     if not st.session_state.system_prompt_counted:
                         st.session_state.system_prompt_counted = True
-                        system_prompt_tokens = self.backend.count_tokens(TEXAS_TOURISM_AGENT_PROMPT)
-                        total_input_tokens = user_input_tokens + system_prompt_tokens
+                        total_input_tokens = user_input_tokens + _system_prompt_tokens(self.backend)
                     else:
                         total_input_tokens = user_input_tokens
-                    
+
                     st.session_state.token_usage['input_tokens'] += total_input_tokens
-                    
-                    estimated_output_tokens = self.backend.count_tokens(full_response)
                     st.session_state.token_usage['output_tokens'] += estimated_output_tokens
                     st.session_state.token_usage['total_tokens'] += total_input_tokens + estimated_output_tokens
                 
@@ -353,8 +606,12 @@ class TravelTexasFrontend:
                 yield error_msg
             
             finally:
+                # Runs on normal completion and on GeneratorExit when the
+                # consumer abandons the stream; either way the pump thread
+                # must stop waiting on the queue
+                consumer_gone.set()
                 st.session_state.is_processing = False
-        
+
         st.write_stream(response_generator())
 
     def check_pending_response(self):
@@ -375,38 +632,30 @@ class TravelTexasFrontend:
             st.subheader("Model Cost Comparison")
         with col2:
             if st.button(
-                "🔄 Refresh Data", 
-                key="refresh_analytics", 
+                "🔄 Refresh Data",
+                key="refresh_analytics",
                 type="primary",
                 width='stretch'
             ):
-                st.rerun()
-        
-        # Fetch live data from Supabase
-        comparison_data = self.backend.get_cost_comparison_table()
+                # The click itself already rerun the script; clearing here
+                # makes the fetch below re-query in this same pass
+                _cost_comparison_rows.clear()
+
+        # Fetch live data from Supabase (cached across reruns)
+        comparison_data = _cost_comparison_rows(self.backend)
         
         if comparison_data:
-            # Use analytics dashboard for formatted display
-            from analytics_dashboard import AnalyticsDashboard
-            analytics = AnalyticsDashboard()
+            # Use the process-wide analytics dashboard for formatted display
+            analytics = _get_analytics_dashboard()
             df = analytics.generate_cost_comparison_table()
             
             # Display table
             st.dataframe(df, width='stretch')
             
-            # Display chart
-            import plotly.express as px
-            fig = px.bar(df, x='Model', y='Cost_per_Mil', 
-                       title='Cost Per Mil by Model (Live Data)',
-                       color='Cost_per_Mil',
-                       color_continuous_scale='RdYlGn_r')
-            
-            # Make axis labels bold
-            fig.update_layout(
-                xaxis_title_font=dict(size=14, family="Arial", color="black"),
-                yaxis_title_font=dict(size=14, family="Arial", color="black")
-            )
-            
+            # Display chart, rebuilt from the cached dict
+            import plotly.graph_objects as go
+            fig = go.Figure(_cost_comparison_figure_dict(df))
+
             st.plotly_chart(fig, width='stretch', key="cost_comparison_chart")
         else:
             st.info("No cost comparison data available. Start chatting to generate data!")
@@ -439,43 +688,8 @@ class TravelTexasFrontend:
 
     def render_main_app(self):
         """Render the main application"""
-        try:
-            with open('styles.css', 'r') as f:
-                css_content = f.read()
-        except FileNotFoundError:
-            css_content = """
-            /* ChatGPT-like styling */
-            .stChatMessage {
-                margin-bottom: 1rem;
-                animation: fadeIn 0.3s ease-in;
-            }
-            
-            @keyframes fadeIn {
-                from { opacity: 0; transform: translateY(10px); }
-                to { opacity: 1; transform: translateY(0); }
-            }
-            
-            /* Keep input at bottom */
-            .stChatInput {
-                position: sticky;
-                bottom: 0;
-                background: white;
-                z-index: 100;
-                margin-top: 2rem;
-            }
-            
-            /* Smooth scrolling */
-            .main .block-container {
-                padding-bottom: 6rem;
-            }
-            """
-        
-        st.markdown(f"""
-        <style>
-        {css_content}
-        </style>
-        """, unsafe_allow_html=True)
-        
+        st.markdown(_css_block(), unsafe_allow_html=True)
+
         # Create tabs for main app and analytics
         tab1, tab2 = st.tabs(["💬 Chat", "📊 Analytics"])
         
@@ -8,15 +8,18 @@ import sys
 def install_requirements():
     """Install all required packages"""
     
+    # Keep this list in sync with requirements.txt
     requirements = [
-        "streamlit>=1.28.0",
-        "requests>=2.31.0", 
+        "streamlit>=1.37.0",
+        "httpx[http2]>=0.27.0",
+        "orjson>=3.8.0",
+        "tiktoken>=0.5.0",
         "python-dotenv>=1.0.0",
         "supabase>=2.0.0",
-        "plotly>=5.17.0",
-        "pandas>=2.0.0",
-        "tiktoken>=0.5.0",
-        "aiohttp>=3.8.0"  # Added missing aiohttp
+        "numpy>=1.24.0",
+        "pandas>=1.5.0",
+        "plotly>=5.0.0",
+        "aiohttp>=3.8.0"
     ]
     
     print("📦 Installing required packages...")
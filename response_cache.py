@@ -0,0 +1,85 @@
+"""
+Response cache for Travel Texas AI Agent
+Serves repeated questions from memory instead of re-calling OpenRouter
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+
+# Chat intents here are highly repetitive ("tell me about Austin", the three
+# sample prompts, ...), so an exact-match cache on the normalized query
+# already captures most repeats without any embedding model.
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Size of each chunk yielded when replaying a cached reply as a stream
+_REPLAY_CHUNK_CHARS = 32
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a user query for cache lookup (case, punctuation, spacing)"""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def context_fingerprint(messages) -> str:
+    """Fingerprint the conversation that precedes the current question.
+
+    The cache is shared process-wide and the same words mean different
+    things in different conversations ("tell me more"), so entries are
+    scoped to their exact surrounding context. First-turn questions all
+    fingerprint the same way, which keeps the common repeated openers
+    hitting across users.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            digest.update(message.get('role', '').encode())
+            digest.update(b'\x00')
+            digest.update(content.encode())
+            digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """In-process LRU cache of (model, context, normalized query) -> reply"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, query: str, context: str = ""):
+        """Return the cached reply for a query in this context, or None"""
+        key = (model, context, normalize_query(query))
+        reply = self._entries.get(key)
+        if reply is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return reply
+
+    def put(self, model: str, query: str, reply: str, context: str = ""):
+        """Store a completed reply for future repeats of the same query"""
+        if not reply:
+            return
+
+        key = (model, context, normalize_query(query))
+        self._entries[key] = reply
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached replies"""
+        self._entries.clear()
+
+
+def replay_as_stream(reply: str):
+    """Yield a cached reply in small chunks so the UI streams it like a live response"""
+    for start in range(0, len(reply), _REPLAY_CHUNK_CHARS):
+        yield reply[start:start + _REPLAY_CHUNK_CHARS]
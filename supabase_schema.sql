@@ -52,6 +52,70 @@ CREATE TABLE IF NOT EXISTS usage_analytics (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Pre-aggregated views so dashboards fetch a handful of summary rows
+-- instead of transferring every session and aggregating in Python
+CREATE OR REPLACE VIEW daily_usage_stats AS
+SELECT
+    DATE(start_time) AS date,
+    SUM(total_cost) AS cost,
+    COUNT(*) AS sessions
+FROM sessions
+GROUP BY DATE(start_time);
+
+CREATE OR REPLACE VIEW model_daily_stats AS
+SELECT
+    model_used,
+    DATE(start_time) AS date,
+    COUNT(*) AS sessions,
+    SUM(total_messages) AS total_messages,
+    SUM(total_input_tokens) AS total_input_tokens,
+    SUM(total_output_tokens) AS total_output_tokens,
+    SUM(total_cost) AS total_cost
+FROM sessions
+GROUP BY model_used, DATE(start_time);
+
+-- Atomic message insert + session-totals update in one call, taking the
+-- buffered message rows as a JSONB array
+CREATE OR REPLACE FUNCTION log_and_update_session(
+    p_session_id TEXT,
+    p_messages JSONB,
+    p_total_cost DECIMAL,
+    p_total_messages INT,
+    p_total_input_tokens INT,
+    p_total_output_tokens INT
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO messages (session_id, message_type, input_tokens, output_tokens, cost, model_used, content)
+    SELECT p_session_id, m->>'message_type', (m->>'input_tokens')::INT, (m->>'output_tokens')::INT,
+           (m->>'cost')::DECIMAL, m->>'model_used', m->>'content'
+    FROM jsonb_array_elements(p_messages) AS m;
+
+    UPDATE sessions SET
+        total_cost = p_total_cost,
+        total_messages = p_total_messages,
+        total_input_tokens = p_total_input_tokens,
+        total_output_tokens = p_total_output_tokens,
+        end_time = NOW()
+    WHERE session_id = p_session_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One-shot spending dashboard: aggregated session totals plus the active
+-- daily/monthly budget rows in a single round-trip
+CREATE OR REPLACE FUNCTION get_spending_dashboard(days INT DEFAULT 30)
+RETURNS JSON AS $$
+SELECT json_build_object(
+    'total_spent', COALESCE((SELECT SUM(total_cost) FROM sessions
+        WHERE created_at > NOW() - make_interval(days => days)), 0),
+    'total_sessions', (SELECT COUNT(*) FROM sessions
+        WHERE created_at > NOW() - make_interval(days => days)),
+    'daily_budget', (SELECT row_to_json(b) FROM budgets b
+        WHERE b.budget_type = 'daily' AND b.is_active LIMIT 1),
+    'monthly_budget', (SELECT row_to_json(b) FROM budgets b
+        WHERE b.budget_type = 'monthly' AND b.is_active LIMIT 1)
+);
+$$ LANGUAGE sql STABLE;
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions(session_id);
 CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id);